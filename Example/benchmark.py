@@ -0,0 +1,327 @@
+#! /usr/bin/env python
+'''
+Description : Benchmarks of qxtoolkit on synthetic data, no camera needed.
+              Usage: python ./Example/benchmark.py {imdir,skip,alloc,record,motion,schedule,graffiti,text} [-h]
+FilePath    : /qxtoolkit/Example/benchmark.py
+Author      : qxsoftware@163.com
+Date        : 2026-10-18 09:12:40
+LastEditTime: 2026-10-18 09:12:40
+Refer to    : https://github.com/QixuanAI/qxtoolkit
+'''
+
+import os
+import sys
+import cv2
+import time
+import argparse
+import datetime
+import tempfile
+import tracemalloc
+import numpy as np
+from timeit import default_timer as now
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import qxtoolkit as qx
+
+
+def make_image_folder(folder, count, size=(1280, 720)):
+    """Write `count` random-noise JPEGs into `folder`, which are slow to decode."""
+    rng = np.random.default_rng(0)
+    w, h = size
+    base = rng.integers(0, 256, (h, w, 3), dtype=np.uint8)
+    for i in range(count):
+        img = np.roll(base, i, axis=1)
+        cv2.imwrite(os.path.join(folder, "%06d.jpg" % i), img)
+    return folder
+
+
+def bench_imdir(args):
+    """Images/sec of ImagesGetter on a folder of JPEGs, with different worker count."""
+    with tempfile.TemporaryDirectory() as folder:
+        make_image_folder(folder, args.count, (args.width, args.height))
+        print("%8s %8s %12s" % ("workers", "inflight", "images/sec"))
+        for workers in args.workers:
+            getter = qx.ImagesGetter(folder, workers=workers)
+            start = now()
+            num = sum(1 for _ in getter)
+            elapsed = now() - start
+            print("%8d %8d %12.1f" % (workers, getter.inflight, num / elapsed))
+
+
+def make_video(path, count, size=(640, 360), fps=25, fourcc="mp4v"):
+    """Write a `count` frames moving-noise video to `path`."""
+    rng = np.random.default_rng(0)
+    w, h = size
+    base = cv2.resize(rng.integers(0, 256, (h // 8, w // 8, 3), dtype=np.uint8), (w, h))
+    out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), fps, (w, h))
+    for i in range(count):
+        out.write(np.roll(base, 4 * i, axis=1))
+    out.release()
+    return path
+
+
+def bench_skip(args):
+    """Frames/sec of a video with frame skip, decoding forward by grab() vs seeking."""
+    with tempfile.TemporaryDirectory() as folder:
+        path = make_video(os.path.join(folder, "skip.mp4"), args.count,
+                          (args.width, args.height), fourcc=args.fourcc)
+        cap = cv2.VideoCapture(path)
+        print("guessed GOP size:", qx.imgetter.guess_gop_size(cap))
+        cap.release()
+        print("%8s %12s %12s %8s" % ("interval", "grab fps", "seek fps", "winner"))
+        for interval in args.intervals:
+            fps = []
+            for threshold in (args.count, 0):  # always grab, always seek
+                getter = qx.ImagesGetter(path, interval=interval, seek_threshold=threshold)
+                start = now()
+                num = sum(1 for img in getter if img is not None)
+                fps.append(num / (now() - start))
+            print("%8d %12.1f %12.1f %8s" %
+                  (interval, fps[0], fps[1], "grab" if fps[0] >= fps[1] else "seek"))
+
+
+def _count_alloc(read, frames):
+    """Call `read` for `frames` times, return (MB allocated per call, calls allocating a frame)."""
+    tracemalloc.start()
+    total, allocs, nbytes = 0, 0, None
+    for _ in range(frames):
+        current = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        frame = read()
+        if frame is None:
+            break
+        nbytes = nbytes or frame.nbytes
+        grown = tracemalloc.get_traced_memory()[1] - current
+        total += grown
+        allocs += grown >= nbytes // 2
+    tracemalloc.stop()
+    return total / frames / 2**20, allocs
+
+
+def bench_alloc(args):
+    """Memory allocated per frame with and without reusable frame buffers."""
+    from qxtoolkit.cam_record import VideoCapture
+    with tempfile.TemporaryDirectory() as folder:
+        path = make_video(os.path.join(folder, "alloc.avi"), args.count,
+                          (args.width, args.height), fourcc="MJPG")
+        print("%-28s %10s %14s %12s" % ("reader", "fps", "MB alloc/frame", "frame allocs"))
+        for reuse in (0, 2):
+            readers = {
+                "ImagesGetter(reuse=%d)" % reuse:
+                    lambda: qx.ImagesGetter(path, reuse=reuse).__next__,
+                "VideoCapture(reuse=%d)" % reuse:
+                    lambda: (lambda cap: lambda: cap.read()[1])(VideoCapture(path, reuse=reuse)),
+            }
+            for name, new_reader in readers.items():
+                read = new_reader()
+                start = now()
+                for _ in range(args.count // 2):
+                    read()
+                fps = args.count // 2 / (now() - start)
+                mb, allocs = _count_alloc(new_reader(), args.count // 2)
+                print("%-28s %10.1f %14.2f %12d" % (name, fps, mb, allocs))
+
+
+def bench_record(args):
+    """Throughput and latency of the recorder with synthetic cameras, e.g. 4K at 120 fps."""
+    from qxtoolkit.cam_record import MultiRecorder
+    uri = "synthetic:{}?width={}&height={}&fps={}&jitter={}&dropout={}".format(
+        args.pattern, args.width, args.height, args.fps, args.jitter, args.dropout)
+    with tempfile.TemporaryDirectory() as folder:
+        recorder = MultiRecorder([uri] * args.cams, folder, args.quality, fps=args.fps)
+        latency = {}
+        for r in recorder.recorders:
+            def write(frame, timestamp, _write=r.writer.write, _lat=latency.setdefault(r, [])):
+                _write(frame, timestamp)
+                _lat.append(recorder.clock() - timestamp)
+            r.writer.write = write
+        recorder.start()
+        recorder.wait(args.seconds)
+        recorder.stop()
+        print("%4s %12s %12s %8s %10s %14s %14s" % (
+            "cam", "capture fps", "encode fps", "lost", "blocked s", "latency avg ms", "latency max ms"))
+        for i, r in enumerate(recorder.recorders):
+            lat = np.array(latency[r]) * 1000 if latency[r] else np.zeros(1)
+            print("%4d %12.1f %12.1f %8d %10.2f %14.1f %14.1f" % (
+                i, r.stats["capture"].count / args.seconds, r.stats["encode"].count / args.seconds,
+                r.cam.cam.lost, r.stats["capture"].blocked, lat.mean(), lat.max()))
+
+
+def bench_motion(args):
+    """Cost per frame of MotionDetector, which should be well under 1 ms for 1080p."""
+    frames = []
+    for img in qx.gen_rgb_lissajous_curve_imgs(randFreq=False):
+        frames.append(cv2.resize(img, (args.width, args.height)))
+        if len(frames) >= 30:
+            break
+    frames += [frames[-1]] * 30  # still frames
+    h, w = args.height, args.width
+    settings = {
+        "width=160": dict(width=160),
+        "width=240": dict(width=240),
+        "width=320": dict(width=320),
+        "width=240 alpha=1": dict(width=240, alpha=1),
+        "width=240 blur=0": dict(width=240, blur=0),
+        "width=240 roi=rects": dict(width=240, roi=[(0, 0, w // 2, h // 2), (w // 2, h // 2, w // 4, h // 4)]),
+    }
+    print("%-24s %10s %10s %10s %8s" % ("detector", "mean ms", "p99 ms", "max ms", "motion"))
+    for name, kwargs in settings.items():
+        detector = qx.MotionDetector(**kwargs)
+        times, detected = [], 0
+        for i in range(args.count):
+            frame = frames[i % len(frames)]
+            start = now()
+            detected += detector(frame)
+            times.append(now() - start)
+        times = np.array(times[1:]) * 1000
+        print("%-24s %10.3f %10.3f %10.3f %7d%%" % (
+            name, times.mean(), np.percentile(times, 99), times.max(), detected * 100 // args.count))
+
+
+def bench_schedule(args):
+    """Cost per callback of the scheduler with many jobs, and how late callbacks are."""
+    rng = np.random.default_rng(0)
+    for count in args.jobs:
+        sched = qx.schedule()
+        late = []
+
+        def job(j):
+            late.append(j.lateness)
+        start = now()
+        for delay in rng.random(count) * args.seconds / 2:
+            j = sched.I_Will_Do(job).after(delay).seconds.repeat(args.repeat)
+            j.withInterval(args.seconds / 2 / args.repeat).seconds.withParam(j)
+        setup = now() - start
+        cpu = time.process_time()
+        sched.run_until_complete()
+        cpu = time.process_time() - cpu
+        late = np.array(late) * 1000
+        print("%8d jobs: setup %.2f us/job, %.2f us cpu/callback, late avg %.2f ms, p99 %.2f ms" % (
+            count, setup / count * 1e6, cpu / len(late) * 1e6, late.mean(), np.percentile(late, 99)))
+
+
+def bench_graffiti(args):
+    """Cost per frame of Graffiti overlays vs drawing them by cv2 on every frame."""
+    rng = np.random.default_rng(0)
+    frame = np.full((args.height, args.width, 3), 64, np.uint8)
+    spots = [(int(rng.integers(0, args.width - 160)), int(rng.integers(30, args.height - 80)))
+             for _ in range(args.layers)]
+    graffiti = qx.Graffiti()
+    for i, (x, y) in enumerate(spots):
+        graffiti.box((x, y), (x + 150, y + 60), qx.colors.Blue.value, 2)
+        graffiti.caption("obj%d 0.93" % i, (x, y - 5), fontScale=0.6, color=(0, 255, 255),
+                         bgcolor=(0, 0, 0), alpha=0.8)
+
+    def direct(img):
+        for i, (x, y) in enumerate(spots):
+            cv2.rectangle(img, (x, y), (x + 150, y + 60), qx.colors.Blue.value, 2)
+            cv2.putText(img, "obj%d 0.93" % i, (x, y - 5), cv2.FONT_HERSHEY_DUPLEX, 0.6,
+                        (0, 255, 255), 1, cv2.LINE_AA)
+    start = now()
+    graffiti(frame.copy(), 0.)
+    print("graffiti first frame (rasterizing): %.2f ms" % ((now() - start) * 1000))
+    print("%-12s %10s" % ("overlay", "ms/frame"))
+    for name, draw in (("none", lambda img: img), ("cv2", direct),
+                       ("graffiti", lambda img: graffiti(img, 0.))):
+        img = frame.copy()
+        start = now()
+        for _ in range(args.count):
+            img[...] = frame
+            draw(img)
+        print("%-12s %10.3f" % (name, (now() - start) / args.count * 1000))
+
+
+def bench_text(args):
+    """Cost of drawing text by cv2.putText vs a TextCache, for fixed text and timestamps."""
+    frame = np.zeros((args.height, args.width, 3), np.uint8)
+    start = datetime.datetime(2026, 1, 1)
+    step = datetime.timedelta(seconds=1. / args.fps)
+    stamps = [(start + i * step).strftime(args.format) for i in range(args.count)]
+    font = cv2.FONT_HERSHEY_DUPLEX
+    print("%-8s %-8s %10s %10s %10s" % ("text", "scale", "cv2 us", "cache us", "atlas us"))
+    for scale in args.scales:
+        thickness = max(1, int(scale + 0.5))
+        cache = qx.TextCache()
+        for name, texts in (("fixed", stamps[:1] * args.count), ("stamps", stamps)):
+            cost = []
+            for draw in (cv2.putText, cache.putText,
+                         lambda *a: cache.putText(*a, atlas=True)):
+                begin = now()
+                for text in texts:
+                    draw(frame, text, (20, 60), font, scale, (255, 255, 255), thickness, cv2.LINE_AA)
+                cost.append((now() - begin) / len(texts) * 1e6)
+            print("%-8s %-8.1f %10.1f %10.1f %10.1f" % (name, scale, *cost))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks of qxtoolkit.")
+    subs = parser.add_subparsers(dest="bench", required=True)
+
+    sub = subs.add_parser("imdir", help=bench_imdir.__doc__)
+    sub.add_argument("-n", "--count", type=int, default=300)
+    sub.add_argument("--width", type=int, default=1280)
+    sub.add_argument("--height", type=int, default=720)
+    sub.add_argument("-w", "--workers", type=int, nargs="+", default=[0, 1, 2, 4, 8])
+    sub.set_defaults(func=bench_imdir)
+
+    sub = subs.add_parser("skip", help=bench_skip.__doc__)
+    sub.add_argument("-n", "--count", type=int, default=1500)
+    sub.add_argument("--width", type=int, default=1280)
+    sub.add_argument("--height", type=int, default=720)
+    sub.add_argument("-c", "--fourcc", default="mp4v")
+    sub.add_argument("-i", "--intervals", type=int, nargs="+",
+                     default=[0, 1, 2, 4, 8, 12, 16, 24, 30, 40, 50, 60])
+    sub.set_defaults(func=bench_skip)
+
+    sub = subs.add_parser("alloc", help=bench_alloc.__doc__)
+    sub.add_argument("-n", "--count", type=int, default=600)
+    sub.add_argument("--width", type=int, default=1920)
+    sub.add_argument("--height", type=int, default=1080)
+    sub.set_defaults(func=bench_alloc)
+
+    sub = subs.add_parser("record", help=bench_record.__doc__)
+    sub.add_argument("-c", "--cams", type=int, default=1)
+    sub.add_argument("-p", "--pattern", default="lissajous")
+    sub.add_argument("--width", type=int, default=3840)
+    sub.add_argument("--height", type=int, default=2160)
+    sub.add_argument("--fps", type=float, default=120)
+    sub.add_argument("--jitter", type=float, default=0.)
+    sub.add_argument("--dropout", type=float, default=0.)
+    sub.add_argument("-q", "--quality", default="normal")
+    sub.add_argument("-s", "--seconds", type=float, default=5)
+    sub.set_defaults(func=bench_record)
+
+    sub = subs.add_parser("motion", help=bench_motion.__doc__)
+    sub.add_argument("-n", "--count", type=int, default=3000)
+    sub.add_argument("--width", type=int, default=1920)
+    sub.add_argument("--height", type=int, default=1080)
+    sub.set_defaults(func=bench_motion)
+
+    sub = subs.add_parser("schedule", help=bench_schedule.__doc__)
+    sub.add_argument("-j", "--jobs", type=int, nargs="+", default=[100, 10000, 100000])
+    sub.add_argument("-r", "--repeat", type=int, default=3)
+    sub.add_argument("-s", "--seconds", type=float, default=10)
+    sub.set_defaults(func=bench_schedule)
+
+    sub = subs.add_parser("graffiti", help=bench_graffiti.__doc__)
+    sub.add_argument("-n", "--count", type=int, default=300)
+    sub.add_argument("-l", "--layers", type=int, default=40)
+    sub.add_argument("--width", type=int, default=1920)
+    sub.add_argument("--height", type=int, default=1080)
+    sub.set_defaults(func=bench_graffiti)
+
+    sub = subs.add_parser("text", help=bench_text.__doc__)
+    sub.add_argument("-n", "--count", type=int, default=3000)
+    sub.add_argument("-f", "--format", default="%Y-%m-%d %H:%M:%S.%f")
+    sub.add_argument("--fps", type=float, default=30)
+    sub.add_argument("-s", "--scales", type=float, nargs="+", default=[0.6, 1, 2])
+    sub.add_argument("--width", type=int, default=1920)
+    sub.add_argument("--height", type=int, default=1080)
+    sub.set_defaults(func=bench_text)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
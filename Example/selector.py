@@ -17,6 +17,7 @@ startpos = None
 crtpos = None
 drag = False
 bboxes = []
+graffiti = qx.Graffiti()  # boxes drawn, rasterized once
 
 WIN_NAME = "Press h for help"
 HELP_MSG = """Keyboard shortcuts:
@@ -34,6 +35,7 @@ def onMouse(event, x, y, flags, *param):
     if event == cv2.EVENT_LBUTTONUP:
         bbox = (startpos, crtpos)
         bboxes.append(bbox)
+        graffiti.box(startpos, crtpos, qx.colors.Blue.value, 2)
         drag = False
     # show event message
     msg = "event:{},x:{},y:{},flags:{}".format(event, x, y, flags)
@@ -47,19 +49,19 @@ def setup_window():
 def main(src):
     setup_window()
     for img in qx.ImagesGetter(src):
-        if bboxes:
-            for p1, p2 in bboxes:
-                img = cv2.rectangle(img, p1, p2, qx.colors.Blue.value, 2)
+        img = graffiti(img)
         if drag:
             img = cv2.rectangle(img, startpos, crtpos, qx.colors.Red.value, 2)
         cv2.imshow(WIN_NAME, img)
         pressed = cv2.waitKey(1)
         if pressed == ord('\r'):
             bboxes.clear()
+            graffiti.clear()
         elif pressed == ord('s'):
             path = datetime.now().strftime("%Y%m%d-%H%M%S")+'.jpg'
             cv2.imwrite(path, img)
             bboxes.clear()
+            graffiti.clear()
         elif pressed == ord('q'):
             break
         elif pressed == ord('h'):
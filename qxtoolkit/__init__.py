@@ -9,6 +9,10 @@ Refer to    : https://github.com/QixuanAI/qxtoolkit
 '''
 
 from .imgetter import *
+from .preprocess import *
+from .framecache import *
+from .capture import *
+from .motion import *
 from .gen_samples import *
 from .graffiti import *
 from .schedule import *
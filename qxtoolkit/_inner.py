@@ -1,9 +1,13 @@
 from timeit import default_timer as now
 import os
+import asyncio
+import functools
 from enum import Enum, unique
+from concurrent.futures import ThreadPoolExecutor
 
 __all__ = ["VIDEO_EXT", "IMG_EXT", "FOURCC_CODEC", "FATAL_ERROR", "ERROR", "WARNING",
-           "INFOMATION", "IGNORE", "colors", "report", "chronograph"]
+           "INFOMATION", "IGNORE", "colors", "report", "chronograph",
+           "END_OF_FRAMES", "async_frames"]
 
 VIDEO_EXT = ('.mp4', '.avi', '.mpg', '.mpeg', '.mov')
 IMG_EXT = ('.jpg', '.jpeg', '.jpe', '.png', '.bmp', '.dib', '.tif', '.tiff')
@@ -55,10 +59,127 @@ def report(err, msg, err_level_adj=None):
         pass
 
 
+END_OF_FRAMES = object()  # returned by a blocking read when there are no more frames
+
+
+async def async_frames(read, maxsize=2, executor=None):
+    """
+    Async generator of frames from a blocking `read()`, which returns a frame or
+    END_OF_FRAMES. A producer task runs `read` in `executor` (a new single thread
+    executor if None) and puts frames into a queue of at most `maxsize` frames, so it
+    stops reading when the consumer falls behind. Closing or cancelling the consumer
+    cancels the producer, and waits for an in-progress read to finish.
+    """
+    loop = asyncio.get_running_loop()
+    own_executor = executor is None
+    if own_executor:
+        executor = ThreadPoolExecutor(1, thread_name_prefix="async_frames")
+    frames = asyncio.Queue(maxsize)
+    reading = []    # the concurrent future of the current read
+
+    async def _produce():
+        try:
+            while True:
+                reading[:] = [executor.submit(read)]
+                frame = await asyncio.wrap_future(reading[0])
+                await frames.put(frame)
+                if frame is END_OF_FRAMES:
+                    return
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:  # hand over to the consumer
+            await frames.put(e)
+
+    producer = loop.create_task(_produce())
+    try:
+        while True:
+            frame = await frames.get()
+            if frame is END_OF_FRAMES:
+                break
+            if isinstance(frame, Exception):
+                raise frame
+            yield frame
+    finally:
+        producer.cancel()
+        for future in [producer] + [asyncio.wrap_future(f) for f in reading]:
+            try:
+                await future
+            except (asyncio.CancelledError, Exception):
+                pass
+        if own_executor:
+            executor.shutdown(wait=False)
+
+
 # from datetime import datetime
 
 
+class Lap:
+    """Durations of a named stage: count, total and max of all of them, and the
+    last `keep` ones for percentiles."""
+
+    def __init__(self, name, keep=1024):
+        self.name = name
+        self.count = 0
+        self.total = 0.
+        self.max = 0.
+        self._recent = [0.] * keep
+
+    def add(self, seconds):
+        self._recent[self.count % len(self._recent)] = seconds
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.
+
+    def percentile(self, q):
+        """q-th percentile of the recent durations, q in [0, 100]."""
+        recent = sorted(self._recent[:min(self.count, len(self._recent))])
+        if not recent:
+            return 0.
+        return recent[min(len(recent) - 1, int(round(q / 100 * (len(recent) - 1))))]
+
+    def summary(self):
+        return {"count": self.count, "mean": self.mean, "p50": self.percentile(50),
+                "p95": self.percentile(95), "p99": self.percentile(99), "max": self.max}
+
+    def __str__(self):
+        return "{}: {} times, mean {:.3f} ms, p50 {:.3f} ms, p95 {:.3f} ms, p99 {:.3f} ms, max {:.3f} ms".format(
+            self.name, self.count, *(v * 1000 for v in list(self.summary().values())[1:]))
+
+
+class _Span:
+    """Time a block into a Lap, as a context manager."""
+    __slots__ = ("lap", "start")
+
+    def __init__(self, lap):
+        self.lap = lap
+
+    def __enter__(self):
+        self.start = now()
+        return self
+
+    def __exit__(self, *exc):
+        self.lap.add(now() - self.start)
+        return False
+
+
 class chronograph:
+    """
+    A stopwatch with pause/resume and an optional countdown of `totaltime` seconds,
+    which also profiles named stages:
+        chrono = chronograph()
+        with chrono("decode"): ...      # time a block
+        @chrono("resize")               # time every call of a function
+        def resize(img): ...
+        chrono.lap("display")           # time since the last lap or start
+        print(chrono)                   # count, mean, p50, p95, p99 and max per stage
+    Timing a stage costs about a microsecond. Stages can be timed from several threads,
+    as long as each stage is timed by one thread. Set `enabled` to False to skip timing.
+    """
     status = Enum('status', ('init', 'start', 'pause', 'finish', 'stop'))
 
     # class status(Enum):
@@ -68,33 +189,66 @@ class chronograph:
     #     finish = 3
     #     stop = 4
 
-    def __init__(self, totaltime=0):
-        self.__status__ = status.init
+    def __init__(self, totaltime=0, keep=1024):
+        """
+        Args:
+            @totaltime: seconds to count down, 0 means no countdown.
+            @keep: count of recent durations per stage kept for percentiles.
+        """
+        self.__status__ = self.status.init
         self._init = now()
+        self._start = self._init
+        self._paused = 0.       # seconds paused before the current pause
+        self._pausedAt = None
+        self._stop = None
+        self._lapAt = None
+        self._totaltime = totaltime
+        self._finish = False
+        self._onFinish = None
+        self.keep = keep
+        self.laps = {}          # stage name: Lap
+        self.enabled = True
 
     def start(self):
-        self.__status__ = status.start
-        self._start = now()
+        self.__status__ = self.status.start
+        self._start = self._lapAt = now()
+        self._paused = 0.
+        self._pausedAt = self._stop = None
+        self._finish = False
 
     def restart(self):
-        self.__status__ = status.start
-        self._start = now()
+        self.start()
 
     def stop(self):
-        self.__status__ = status.stop
+        if self._pausedAt is not None:
+            self.resume()
+        self.__status__ = self.status.stop
         self._stop = now()
 
     def pause(self):
-        self.__status__ = status.pause
-        pass
+        if self._pausedAt is None and self.__status__ is self.status.start:
+            self.__status__ = self.status.pause
+            self._pausedAt = now()
+
+    def resume(self):
+        if self._pausedAt is not None:
+            self._paused += now() - self._pausedAt
+            self._pausedAt = None
+            self.__status__ = self.status.start
 
     @property
     def onFinish(self):
-        pass
+        return self._onFinish
 
     @onFinish.setter
     def onFinish(self, value):
-        pass
+        """A function called once, when elapsed is read after the countdown finished."""
+        self._onFinish = value
+
+    @property
+    def isFinished(self):
+        self.elapsed
+        return self._finish
 
     @property
     def totaltime(self):
@@ -106,7 +260,79 @@ class chronograph:
 
     @property
     def elapsed(self):
-        elapsed = now()-self._start
-        if elapsed >= self._totaltime:
+        """Seconds since start, excluding pauses."""
+        end = self._pausedAt or self._stop or now()
+        elapsed = end - self._start - self._paused
+        if self._totaltime > 0 and elapsed >= self._totaltime and not self._finish:
             self._finish = True
+            self.__status__ = self.status.finish
+            if self._onFinish is not None:
+                self._onFinish()
         return elapsed
+
+    @property
+    def remaining(self):
+        """Seconds left of the countdown."""
+        return max(self._totaltime - self.elapsed, 0.)
+
+    def stage(self, name) -> Lap:
+        lap = self.laps.get(name)
+        if lap is None:
+            lap = self.laps.setdefault(name, Lap(name, self.keep))
+        return lap
+
+    def lap(self, name="lap"):
+        """Add the time since the last lap, or start, to the stage `name`, return it."""
+        t = now()
+        last, self._lapAt = self._lapAt or self._start, t
+        seconds = t - last
+        if self.enabled:
+            self.stage(name).add(seconds)
+        return seconds
+
+    def __call__(self, name):
+        """Time a block `with chrono(name):`, or decorate a function by `@chrono(name)`."""
+        return _Stage(self, name)
+
+    def summary(self):
+        """{stage name: {"count", "mean", "p50", "p95", "p99", "max"}}, times in seconds."""
+        return {name: lap.summary() for name, lap in list(self.laps.items())}
+
+    def __str__(self):
+        return "\n".join(str(lap) for lap in list(self.laps.values()))
+
+
+class _Stage:
+    """Returned by chronograph(name), a context manager and a decorator."""
+
+    def __init__(self, chrono, name):
+        self.chrono = chrono
+        self.name = name
+        self._spans = []
+
+    def __enter__(self):
+        span = _Span(self.chrono.stage(self.name)) if self.chrono.enabled else None
+        self._spans.append(span)
+        if span is not None:
+            span.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        span = self._spans.pop()
+        if span is not None:
+            span.__exit__()
+        return False
+
+    def __call__(self, func):
+        chrono, name = self.chrono, self.name
+
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            if not chrono.enabled:
+                return func(*args, **kwargs)
+            start = now()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                chrono.stage(name).add(now() - start)
+        return timed
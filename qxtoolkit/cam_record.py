@@ -10,15 +10,34 @@ Refer to    : https://github.com/QixuanAI/qxtoolkit
 '''
 
 import os
+import re
 import sys
 import cv2
+import time
+import queue
 import argparse
+import threading
 import numpy as np
 from pathlib import Path
+from collections import deque
 from warnings import warn
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from timeit import default_timer as now
+try:  # for package import
+    from ._inner import END_OF_FRAMES, async_frames, chronograph
+    from .capture import open_capture
+    from .graffiti import TextCache, text_cache
+    from .motion import MotionDetector
+    from .schedule import Pacer
+except ImportError:  # for directly running
+    from _inner import END_OF_FRAMES, async_frames, chronograph
+    from capture import open_capture
+    from graffiti import TextCache, text_cache
+    from motion import MotionDetector
+    from schedule import Pacer
 
-__all__ = ["cam_record", "cam_record_cmd", "__version__"]
+__all__ = ["cam_record", "multi_record", "cam_record_cmd", "__version__"]
 
 
 __version__ = "1.1.1"
@@ -38,6 +57,8 @@ s - Save Picture
 k - Keep Current Resolution Ratio({KeepResol})
 ←↓↑→ - Adjust Pan & Tilt
 +- - Zoom In/Out
+i - Show Pipeline Statistics
+t - Trigger Recording(with --pre)
 h - Show This Help"""
 
 ZoomResol = 100
@@ -48,7 +69,7 @@ TiltResol = 10000
 def get_media_folder():
     """Return system default picture and video folder"""
     pic, video = "Pictures", "Videos"
-    if sys.platform == "linux":
+    if sys.platform == "linux" and (Path.home()/".config/user-dirs.dirs").is_file():
         with open(Path.home()/".config/user-dirs.dirs") as f:
             for i in f.readlines():
                 i = i.strip()
@@ -57,7 +78,6 @@ def get_media_folder():
                 elif i.startswith("XDG_VIDEOS_DIR"):
                     video = i.split("=")[-1].strip("\"'").replace("$HOME", "~")
     elif sys.platform == "win32":
-        import re
         import winreg
         keys = winreg.OpenKey(
             winreg.HKEY_CURRENT_USER, r"Software\Microsoft\Windows\CurrentVersion\Explorer\User Shell Folders")
@@ -75,6 +95,15 @@ def get_media_folder():
 PICTURE, VIDEO = get_media_folder()
 
 
+def _file_name(cam_id) -> str:
+    """A part of file names for a camera id, a device number, a video path or a capture uri."""
+    name = str(cam_id)
+    if os.path.isfile(name):
+        name = Path(name).stem
+    name = re.sub(r"//[^/@]*@", "//", name)  # no credentials of a stream url
+    return re.sub(r"[^\w.-]+", "_", name).strip("_") or "cam"
+
+
 def adjustSize(img, dw, dh, sw=None, sh=None, adjType="auto"):
     """
     Adjust image size from (sw, sh) to (dw, dh).
@@ -112,15 +141,36 @@ def adjustSize(img, dw, dh, sw=None, sh=None, adjType="auto"):
 
 
 class VideoCapture:
-    def __init__(self, cam_id):
+    def __init__(self, cam_id, reuse=0):
+        """
+        @reuse: If > 0, read() decodes into a ring of this many buffers instead of a new
+                array per frame. A frame will be overwritten after `reuse` more reads.
+        """
+        self._pool = deque([None] * reuse)
         if not self.__setup__(cam_id):
             warn("[!]Can't open camera device " + str(cam_id))
 
     def isOpened(self):
-        return self.cam.isOpened()
+        return getattr(self, "cam", None) is not None and self.cam.isOpened()
 
-    def read(self):
-        return self.cam.read()
+    def read(self, image=None):
+        """Same as cv2.VideoCapture.read, frame is decoded into `image` if its shape fits."""
+        if image is not None or not self._pool:
+            return self.cam.read(image)
+        ret, frame = self.cam.read(self._pool[0])
+        self._pool.rotate(-1)
+        if ret:
+            self._pool[-1] = frame
+        return ret, frame
+
+    def aiter(self, maxsize=2, executor=None):
+        """Async iterator of frames until a read fails: `async for frame in cam.aiter(): ...`
+        Frames are read in `executor` (a new thread if None) and wait in a queue of at
+        most `maxsize` frames. With reuse, make it larger than maxsize + 1."""
+        def _read():
+            ret, frame = self.read()
+            return frame if ret else END_OF_FRAMES
+        return async_frames(_read, maxsize, executor)
 
     def set(self, propId, value):
         return self.cam.set(propId, value)
@@ -134,7 +184,7 @@ class VideoCapture:
 
     def __setup__(self, cam_id):
         try:
-            cam = cv2.VideoCapture(cam_id)
+            cam = open_capture(cam_id)
             if cam.isOpened():
                 self.cam = cam
                 self.ID = cam_id
@@ -160,19 +210,71 @@ class FakeWriter:
     def __init__(self, *args):
         pass
 
-    def write(self, frame):
+    def write(self, frame, timestamp=None):
         pass
 
     def release(self):
         pass
 
 
+class TimeStamp:
+    """
+    Burn the wall time of frames into them, e.g. VideoWriter(..., stamp=TimeStamp()).
+    The text is drawn in place from glyphs cached by a TextCache, so a new time only
+    pastes its changed digits rather than rasterizing the whole text again.
+    """
+
+    def __init__(self, fmt="%Y-%m-%d %H:%M:%S", epoch=None, org=None, fontScale=None,
+                 color=(255, 255, 255), shadow=(0, 0, 0), cache=None):
+        """
+        @fmt: format of datetime.strftime.
+        @epoch: wall time of timestamp 0, None means timestamps are of time.monotonic().
+        @org: bottom-left corner of the text, None means at the top-left of frames.
+        @fontScale: None means scaled by the height of frames.
+        @shadow: color of a shadow 1 pixel below right of the text, None for none.
+        @cache: a TextCache, None means the shared one.
+        """
+        self.fmt = fmt
+        self.epoch = time.time() - time.monotonic() if epoch is None else epoch
+        self.org = org
+        self.fontScale = fontScale
+        self.color = color
+        self.shadow = shadow
+        self.cache = text_cache if cache is None else cache
+
+    def __call__(self, frame, timestamp=None):
+        t = time.time() if timestamp is None else self.epoch + timestamp
+        text = datetime.fromtimestamp(t).strftime(self.fmt)
+        scale = self.fontScale or max(0.5, frame.shape[0] / 1080.)
+        thickness = max(1, int(scale + 0.5))
+        org = self.org or (int(16 * scale), int(48 * scale))
+        if self.shadow is not None:
+            self.cache.putText(frame, text, (org[0] + 1, org[1] + 1), cv2.FONT_HERSHEY_DUPLEX,
+                               scale, self.shadow, thickness, cv2.LINE_AA, atlas=True)
+        return self.cache.putText(frame, text, org, cv2.FONT_HERSHEY_DUPLEX,
+                                  scale, self.color, thickness, cv2.LINE_AA, atlas=True)
+
+
 class VideoWriter:
     writer = None
 
-    def __init__(self, path, fourcc: str, fps, size):
+    def __init__(self, path, fourcc: str, fps, size, timestamps=False, stamp=None):
+        """
+        @timestamps: Also save the timestamp of every frame to a csv file beside the video,
+                     which is given by write(frame, timestamp).
+        @stamp: a function of (frame, timestamp) drawing on the frame before writing it,
+                e.g. a TimeStamp. It draws on a copy, the caller's frame is left as it is,
+                e.g. for a preview.
+        """
+        self.stamp = stamp
+        self._stamped = None  # the copy to stamp, reused since frames are written at once
         self.path = Path(path)
-        self.path.parent.mkdir(exist_ok=True)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.stamps = None
+        if timestamps:
+            self.stamps = open(self.path.with_suffix(".csv"), "w")
+            self.stamps.write("frame,timestamp\n")
+        self.count = 0
         self.path = str(path)
         if isinstance(fourcc, str) or isinstance(fourcc, list) or isinstance(fourcc, tuple):
             fourcc = cv2.VideoWriter_fourcc(*fourcc)
@@ -185,20 +287,570 @@ class VideoWriter:
         self.writer = cv2.VideoWriter(self.path, fourcc, self.fps, self.size)
         assert self.writer, "Can't initialize VideoWriter."
 
-    def write(self, frame):
+    def write(self, frame, timestamp=None):
         h, w, _ = frame.shape
-        if self.size != (w, h):
+        resized = self.size != (w, h)
+        if resized:
             frame = adjustSize(frame, *self.size, w, h, adjType="auto")
+        if self.stamp is not None:
+            if not resized:
+                if self._stamped is None or self._stamped.shape != frame.shape:
+                    self._stamped = np.empty_like(frame)
+                np.copyto(self._stamped, frame)
+                frame = self._stamped
+            frame = self.stamp(frame, timestamp)
         self.writer.write(frame)
+        if self.stamps is not None:
+            self.stamps.write("%d,%.6f\n" % (self.count, timestamp if timestamp is not None else -1))
+        self.count += 1
 
     def release(self):
         self.writer.release()
+        if self.stamps is not None:
+            self.stamps.close()
 
     def __del__(self):
         if self.writer:
             self.writer.release()
 
 
+class SegmentedWriter:
+    """
+    Write a long recording as a series of VideoWriter segments "<stem>_0000<suffix>",
+    "<stem>_0001<suffix>", ..., starting a new one after `seconds` of frames or `size`
+    bytes. The next segment is opened on a background thread in advance, and the
+    finished one is released there too, so switching never blocks the caller.
+    Finished segments are listed in "<stem>.manifest.csv" with the timestamps of
+    their first and last frames, and the oldest are deleted beyond `keep` segments
+    or `keep_size` bytes.
+    """
+
+    def __init__(self, path, fourcc, fps, size, seconds=None, max_size=None,
+                 keep=None, keep_size=None, timestamps=False, stamp=None):
+        """
+        @path: path of the recording, segments are named after it.
+        @seconds: start a new segment after this many seconds, measured by the
+                  timestamps given to write(), or by time.monotonic() without them.
+        @max_size: start a new segment once the file grows over this many bytes.
+        @keep: count of finished segments to keep, None means all.
+        @keep_size: total bytes of finished segments to keep, None means unlimited.
+        @timestamps: save the timestamps of each segment to a csv beside it.
+        @stamp: drawing on frames before writing them, see VideoWriter.
+        """
+        self.base = Path(path)
+        self.path = str(self.base.with_suffix(".manifest.csv"))
+        self.fourcc, self.fps, self.size = fourcc, fps, size
+        self.seconds, self.max_size = seconds, max_size
+        self.keep, self.keep_size = keep, keep_size
+        self.timestamps = timestamps
+        self.stamp = stamp
+        self.count = 0
+        self.segments = []      # finished segments: [index, file, frames, start, end]
+        self._index = 0
+        self._pool = ThreadPoolExecutor(1, "segment")
+        self.writer = self._open(0)
+        self._next = self._pool.submit(self._open, 1)
+        self._start = self._end = None
+
+    def _open(self, index):
+        path = self.base.with_name("%s_%04d%s" % (self.base.stem, index, self.base.suffix))
+        return VideoWriter(path, self.fourcc, self.fps, self.size, self.timestamps, self.stamp)
+
+    def write(self, frame, timestamp=None):
+        t = timestamp if timestamp is not None else time.monotonic()
+        if self._start is None:
+            self._start = t
+        elif (self.seconds is not None and t - self._start >= self.seconds) or \
+                (self.max_size is not None and os.path.getsize(self.writer.path) >= self.max_size):
+            self._rotate()
+            self._start = t
+        self.writer.write(frame, timestamp)
+        self._end = t
+        self.count += 1
+
+    def _rotate(self):
+        done = (self._index, self.writer, self._start, self._end)
+        self.writer = self._next.result()
+        self._index += 1
+        self._next = self._pool.submit(self._open, self._index + 1)
+        self._pool.submit(self._finish, *done)
+
+    def _finish(self, index, writer, start, end):
+        """Release a segment, list it in the manifest and apply the retention limits."""
+        writer.release()
+        self.segments.append([index, Path(writer.path).name, writer.count, start, end])
+        while self.segments and (
+                (self.keep is not None and len(self.segments) > self.keep) or
+                (self.keep_size is not None and len(self.segments) > 1 and
+                 sum(self._bytes(s) for s in self.segments) > self.keep_size)):
+            oldest = self.base.with_name(self.segments.pop(0)[1])
+            for p in (oldest, oldest.with_suffix(".csv")):
+                if p.exists():
+                    p.unlink()
+        tmp = Path(self.path + ".tmp")
+        with open(tmp, "w") as f:
+            f.write("segment,file,frames,start,end\n")
+            for s in self.segments:
+                f.write("%d,%s,%d,%.6f,%.6f\n" % tuple(s))
+        os.replace(tmp, self.path)
+
+    def _bytes(self, segment):
+        try:
+            return os.path.getsize(self.base.with_name(segment[1]))
+        except OSError:
+            return 0
+
+    def release(self):
+        if self._pool is None:
+            return
+        if self.writer.count:
+            self._pool.submit(self._finish, self._index, self.writer, self._start, self._end)
+        else:
+            self._pool.submit(self._discard, self.writer)
+        self._pool.submit(self._discard, self._next.result())
+        self._pool.shutdown()
+        self._pool = None
+
+    def _discard(self, writer):
+        """Release a segment without frames and delete its files."""
+        writer.release()
+        for p in (Path(writer.path), Path(writer.path).with_suffix(".csv")):
+            if p.exists():
+                p.unlink()
+
+
+class FrameRing:
+    """
+    The last `capacity` frames with their timestamps, in memory allocated once for
+    the first frame. With `jpeg` quality given, frames are kept JPEG encoded instead,
+    which takes about a tenth of the memory but costs an encode per frame.
+    """
+
+    def __init__(self, capacity, jpeg=None):
+        self.capacity = max(1, int(capacity))
+        self.jpeg = jpeg
+        self._frames = None
+        self._stamps = np.zeros(self.capacity)
+        self._next = 0     # slot of the next frame
+        self._count = 0
+
+    def push(self, frame, timestamp):
+        if self.jpeg is not None:
+            if self._frames is None:
+                self._frames = [None] * self.capacity
+            self._frames[self._next] = cv2.imencode(
+                ".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg])[1]
+        else:
+            if self._frames is None or self._frames.shape[1:] != frame.shape:
+                self._frames = np.empty((self.capacity,) + frame.shape, frame.dtype)
+                self._count = 0
+            np.copyto(self._frames[self._next], frame)
+        self._stamps[self._next] = timestamp
+        self._next = (self._next + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        """Yield (timestamp, frame) from the oldest."""
+        for i in range(self._next - self._count, self._next):
+            frame = self._frames[i % self.capacity]
+            if self.jpeg is not None:
+                frame = cv2.imdecode(frame, cv2.IMREAD_UNCHANGED)
+            yield float(self._stamps[i % self.capacity]), frame
+
+    def clear(self):
+        self._count = 0
+
+    @property
+    def nbytes(self):
+        """Bytes of memory taken by the frames."""
+        if self._frames is None:
+            return 0
+        if self.jpeg is not None:
+            return sum(f.nbytes for f in self._frames if f is not None)
+        return self._frames.nbytes
+
+
+class TriggeredWriter:
+    """
+    Record only around events. The last `pre` seconds of frames are kept in a FrameRing,
+    when trigger() is called or `detector(frame, timestamp)` returns True, they are
+    written to a new video "<stem>_event0000<suffix>" followed by the frames of `post`
+    seconds after the last trigger, then the writer goes back to buffering.
+    """
+
+    def __init__(self, path, fourcc, fps, size, pre=5., post=5., jpeg=None,
+                 timestamps=False, detector=None, stamp=None):
+        """
+        @pre: seconds of frames to keep before a trigger.
+        @post: seconds to keep recording after the last trigger.
+        @jpeg: If given, JPEG quality to keep buffered frames compressed.
+        @detector: a function of (frame, timestamp) which returns True to trigger.
+        @stamp: drawing on frames when they are written, see VideoWriter.
+        """
+        self.base = Path(path)
+        self.path = str(self.base.with_name(self.base.stem + "_event*" + self.base.suffix))
+        self.fourcc, self.fps, self.size = fourcc, fps, size
+        self.post = post
+        self.timestamps = timestamps
+        self.detector = detector
+        self.stamp = stamp
+        self.ring = FrameRing(round(pre * fps), jpeg)
+        self.writer = None
+        self.events = []    # [path, first timestamp, last timestamp]
+        self.count = 0
+        self._pending = False
+        self._until = None
+
+    def trigger(self):
+        """Start or extend an event from the next frame, safe to call from any thread."""
+        self._pending = True
+
+    def write(self, frame, timestamp=None):
+        t = timestamp if timestamp is not None else time.monotonic()
+        if self._pending or (self.detector is not None and self.detector(frame, t)):
+            self._pending = False
+            self._until = t + self.post
+            if self.writer is None:
+                self._open(t)
+        if self.writer is not None and t > self._until:
+            self._close()
+        if self.writer is None:
+            self.ring.push(frame, t)
+            return
+        self.writer.write(frame, timestamp)
+        self.events[-1][2] = t
+        self.count += 1
+
+    def _open(self, t):
+        path = self.base.with_name("%s_event%04d%s" % (
+            self.base.stem, len(self.events), self.base.suffix))
+        self.writer = VideoWriter(path, self.fourcc, self.fps, self.size, self.timestamps,
+                                  self.stamp)
+        self.events.append([self.writer.path, t, t])
+        for i, (ts, frame) in enumerate(self.ring):
+            if i == 0:
+                self.events[-1][1] = ts
+            self.writer.write(frame, ts)
+            self.count += 1
+        self.ring.clear()
+
+    def _close(self):
+        self.writer.release()
+        self.writer = None
+
+    def release(self):
+        if self.writer is not None:
+            self._close()
+
+    def __str__(self):
+        return "trigger: {} events, {} frames, buffer {}/{} frames in {:.1f} MB".format(
+            len(self.events), self.count, len(self.ring), self.ring.capacity,
+            self.ring.nbytes / (1 << 20))
+
+
+def open_writer(path, fourcc, fps, size, timestamps=False, segment=None, keep=None,
+                pre=None, post=5., jpeg=None, detector=None, stamp=None):
+    """A VideoWriter, a SegmentedWriter rotating every `segment` seconds, or with `pre`
+    seconds given, a TriggeredWriter."""
+    if pre is not None:
+        return TriggeredWriter(path, fourcc, fps, size, pre, post, jpeg, timestamps, detector,
+                               stamp)
+    if segment:
+        return SegmentedWriter(path, fourcc, fps, size, seconds=segment, keep=keep,
+                               timestamps=timestamps, stamp=stamp)
+    return VideoWriter(path, fourcc, fps, size, timestamps, stamp)
+
+
+class StageStats:
+    """
+    Counters of a pipeline stage. `dropped` is written by the thread of the previous
+    stage, which drops frames from the queue, the others by the stage's own thread.
+    Each counter has a single writer, so no lock is needed.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.count = 0      # frames processed
+        self.dropped = 0    # frames dropped before reaching this stage, by the producer
+        self.busy = 0.      # seconds spent on processing
+        self.maxtime = 0.   # seconds of the slowest frame
+        self.blocked = 0.   # seconds waiting for a full queue of the next stage
+
+    def add(self, seconds):
+        self.count += 1
+        self.busy += seconds
+        self.maxtime = max(self.maxtime, seconds)
+
+    def __str__(self):
+        avg = self.busy / self.count * 1000 if self.count else 0.
+        return "{}: {} frames, avg {:.1f} ms, max {:.1f} ms, dropped {}, blocked {:.2f} s".format(
+            self.name, self.count, avg, self.maxtime * 1000, self.dropped, self.blocked)
+
+
+class FrameQueue:
+    """
+    A bounded queue between two pipeline stages.
+    drop_oldest: If True, put() never blocks, the oldest frame is dropped and counted in
+                 `consumer.dropped`. Otherwise put() waits for free space and counts the
+                 time in `producer.blocked`, which is backpressure to the producer.
+    """
+
+    def __init__(self, maxsize, drop_oldest, producer: StageStats, consumer: StageStats):
+        self._queue = queue.Queue(maxsize)
+        self.drop_oldest = drop_oldest
+        self.producer = producer
+        self.consumer = consumer
+
+    def put(self, item):
+        if not self.drop_oldest:
+            start = now()
+            self._queue.put(item)
+            self.producer.blocked += now() - start
+            return
+        while True:
+            try:
+                self._queue.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                    self.consumer.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout=None):
+        """Return the next frame, or None if timeout."""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class PipelinedRecorder:
+    """
+    Run capture and encoding on their own threads, linked by bounded queues, so a slow
+    encoder or preview doesn't stall reading the camera. Frames to record are never
+    dropped: a full record queue blocks capture, shown in stats["capture"].blocked.
+    Frames to preview only keep the latest ones, the rest are counted in
+    stats["preview"].dropped. Preview runs on the caller's thread, as most GUI
+    backends require, by calling preview().
+    If the source is a video file rather than a camera, capture stops at its end.
+    """
+
+    def __init__(self, cam: VideoCapture, writer=None, process=None, interval=0,
+                 preview_size=2, record_size=64, clock=time.monotonic, schedule=None):
+        """
+        @writer: a VideoWriter, or None to not record.
+        @process: a function applied to every captured frame, e.g. flip.
+        @interval: milliseconds between two reads, paced by deadlines, so the time of
+                   reading and processing is included. 0 means as fast as the camera.
+        @preview_size: 0 means no preview.
+        @clock: returns the timestamp in seconds of a captured frame, which is passed
+                to writer.write(frame, timestamp).
+        @schedule: a schedule with a FrameClock, ticked by the timestamp of every captured
+                   frame on the capture thread, to run jobs aligned to frames.
+        """
+        self.cam = cam
+        self.writer = writer
+        self.process = process
+        self.interval = interval
+        self.preview_size = preview_size
+        self.clock = clock
+        self.schedule = schedule
+        self.pacer = Pacer(1000. / interval) if interval > 0 else None
+        self.stats = {name: StageStats(name) for name in ("capture", "encode", "preview")}
+        # Percentiles of the times of "read", "process", "encode" and "display" (by the caller).
+        self.chrono = chronograph()
+        self._preview = FrameQueue(preview_size, True, self.stats["capture"], self.stats["preview"])
+        self._record = FrameQueue(record_size, False, self.stats["capture"], self.stats["encode"])
+        self._stop = threading.Event()
+        name = "recorder-{}-".format(cam.ID)
+        self._threads = [threading.Thread(target=self._capture, name=name+"capture", daemon=True)]
+        if writer is not None:
+            self._threads.append(threading.Thread(
+                target=self._encode, name=name+"encode", daemon=True))
+
+    def start(self):
+        for t in self._threads:
+            t.start()
+        return self
+
+    def stop(self):
+        """Stop capturing, and wait for all captured frames to be encoded."""
+        self._stop.set()
+        for t in self._threads:
+            t.join()
+
+    @property
+    def isCapturing(self):
+        return self._threads[0].is_alive()
+
+    def preview(self, timeout=1.):
+        """Return the latest captured frame, or None if no frame in `timeout` seconds."""
+        start = now()
+        item = self._preview.get(timeout)
+        if item is None:
+            return None
+        self.stats["preview"].add(now() - start)
+        return item[1]
+
+    def _capture(self):
+        stats = self.stats["capture"]
+        while not self._stop.is_set():
+            start = now()
+            with self.chrono("read"):
+                ret, frame = self.cam.read()
+            timestamp = self.clock()
+            if not ret or frame is None or frame.size == 0:
+                if os.path.isfile(str(self.cam.ID)):  # end of a video file
+                    break
+                warn("[!]No responding from camera " + str(self.cam.ID))
+                time.sleep(0.01)
+                continue
+            if self.process is not None:
+                with self.chrono("process"):
+                    frame = self.process(frame)
+            stats.add(now() - start)
+            if self.preview_size > 0:
+                self._preview.put((timestamp, frame))
+            if self.writer is not None:
+                self._record.put((timestamp, frame))
+            if self.schedule is not None:
+                self.schedule.tick(timestamp)
+            if self.pacer is not None:
+                self.pacer.wait()
+        self._record.put(None)
+
+    def _encode(self):
+        stats = self.stats["encode"]
+        while True:
+            item = self._record.get()
+            if item is None:
+                break
+            start = now()
+            with self.chrono("encode"):
+                self.writer.write(item[1], item[0])
+            stats.add(now() - start)
+
+
+class MultiRecorder:
+    """
+    Record several cameras at the same time, each one has its own capture and encode
+    threads, so no single Python loop serves all streams. Frames of all cameras are
+    stamped by one monotonic clock started by start(), and saved in a csv beside each
+    video, to sync the videos later. A source can also be a video file, e.g. for tests.
+    """
+
+    def __init__(self, sources, saveto=None, quality="normal", fps=None, record_size=64,
+                 timestamps=True, segment=None, keep=None, pre=None, post=5., motion=False,
+                 stamp=False):
+        """
+        @sources: camera device IDs or video files.
+        @saveto: the folder to save videos, default is the system video folder.
+        @quality: a key of CODEC.
+        @fps: fps of saved videos, None means fps of each camera.
+        @segment: If given, split videos into segments of this many seconds.
+        @keep: count of segments to keep per camera, older ones are deleted.
+        @pre, @post: If pre is given, only record around triggers, see TriggeredWriter.
+        @motion: trigger recording by a MotionDetector of each camera.
+        @stamp: burn the wall time into recorded frames by a TimeStamp of each camera.
+        """
+        if motion and pre is None:
+            pre = 0.
+        saveto = Path(saveto if saveto is not None else VIDEO)
+        fourcc, suffix = CODEC[quality]
+        date = datetime.now().strftime("%Y%m%d-%H%M%S")
+        self._t0 = None
+        self.recorders = []
+        self.names = []     # unique name of each camera, in its file names
+        self._stamps = []
+        for i, src in enumerate(sources):
+            cam = VideoCapture(src)
+            if not cam.isOpened():
+                self.release()
+                raise RuntimeError("Can't open camera, device id: " + str(src))
+            name = _file_name(cam.ID)
+            while name in self.names:  # e.g. the same video file twice
+                name += "-" + str(i)
+            self.names.append(name)
+            if stamp:  # one cache each, for encode threads not to wait for each other
+                self._stamps.append(TimeStamp(cache=TextCache(64)))
+            writer = open_writer(saveto / "VID_cam{}_{}{}".format(name, date, suffix),
+                                 fourcc, fps or cam.FPS or 30, cam.shape, timestamps,
+                                 segment, keep, pre, post,
+                                 detector=MotionDetector() if motion else None,
+                                 stamp=self._stamps[-1] if stamp else None)
+            self.recorders.append(PipelinedRecorder(
+                cam, writer, preview_size=0, record_size=record_size, clock=self.clock))
+
+    def clock(self):
+        """Seconds since start(), shared by all cameras."""
+        return time.monotonic() - self._t0
+
+    def start(self):
+        self._t0 = time.monotonic()
+        for s in self._stamps:  # timestamps count from start()
+            s.epoch = time.time()
+        for r in self.recorders:
+            r.start()
+        return self
+
+    def wait(self, duration=None):
+        """Wait until `duration` seconds passed since start, or all sources ended."""
+        while any(r.isCapturing for r in self.recorders):
+            if duration is not None and self.clock() >= duration:
+                break
+            time.sleep(0.05)
+
+    def stop(self):
+        for r in self.recorders:
+            r._stop.set()
+        for r in self.recorders:
+            r.stop()
+        self.release()
+
+    def release(self):
+        for r in self.recorders:
+            r.writer.release()
+
+    @property
+    def stats(self):
+        """{camera name: {stage: StageStats}}, names are unique even for the same source, see names."""
+        return {name: r.stats for name, r in zip(self.names, self.recorders)}
+
+
+def multi_record(cam_ids=None, saveto=None, quality="normal", duration=None,
+                 segment=None, keep=None, pre=None, post=5., motion=False, stamp=False):
+    """Record all cameras at the same time without preview, until Ctrl+C or `duration` seconds."""
+    cam_ids = get_camera_ids(cam_ids)
+    if not cam_ids:
+        raise RuntimeError("Can't find any available cameras.")
+    recorder = MultiRecorder(cam_ids, saveto, quality, segment=segment, keep=keep,
+                             pre=pre, post=post, motion=motion, stamp=stamp).start()
+    for r in recorder.recorders:
+        print("Save to", r.writer.path)
+    try:
+        recorder.wait(duration)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        recorder.stop()
+        for name, stats in recorder.stats.items():
+            print("Camera", name)
+            for st in stats.values():
+                print("\t" + str(st))
+        for name, r in zip(recorder.names, recorder.recorders):
+            print("Camera", name, "times")
+            for lap in r.chrono.laps.values():
+                print("\t" + str(lap))
+        for name, r in zip(recorder.names, recorder.recorders):
+            if isinstance(r.writer, TriggeredWriter):
+                print("Camera", name, r.writer)
+
+
 def get_camera_ids(candidate_ids=[]):
     """find availabel cameras on this platform"""
     available_ids = []
@@ -210,7 +862,7 @@ def get_camera_ids(candidate_ids=[]):
             candidate_ids = list(range(MAX_TRY_ON_WINDOWS))
     for d in candidate_ids:
         try:
-            cam = cv2.VideoCapture(d)
+            cam = open_capture(d)
             if cam.isOpened():
                 available_ids.append(d)
         finally:
@@ -255,9 +907,9 @@ def init_window(fixed: bool, size, cam: VideoCapture, cam_ids, cam_idx, text="In
     width, height = size
     welcom = np.zeros((height, width, 3), dtype=np.uint8)
     font = cv2.FONT_HERSHEY_DUPLEX
-    (tw, th), _ = cv2.getTextSize(text, font, 1, 1)
+    (tw, th), _ = text_cache.getTextSize(text, font, 1, 1)
     org = ((width-tw)//2, (height+th)//2)
-    welcom = cv2.putText(welcom, text, org, font, 1, (192, 168, 31), 1)
+    welcom = text_cache.putText(welcom, text, org, font, 1, (192, 168, 31), 1)
     win_flag = cv2.WINDOW_KEEPRATIO | cv2.WINDOW_GUI_EXPANDED
     win_flag |= cv2.WINDOW_AUTOSIZE if fixed else cv2.WINDOW_NORMAL
     cv2.namedWindow(WIN_NAME, win_flag)
@@ -274,51 +926,64 @@ def init_window(fixed: bool, size, cam: VideoCapture, cam_ids, cam_idx, text="In
 
 def cam_record(cam_ids=None, record=False,
                saveto="./record.avi", quality="normal",
-               interval=0, flip=False, fixedsize=False):
+               interval=0, flip=False, fixedsize=False, segment=None, keep=None,
+               pre=None, post=5., jpeg=None, motion=False, stamp=False):
     global HELP_MSG
     cam_ids = get_camera_ids(cam_ids)
     if not cam_ids:
         raise RuntimeError("Can't find any available cameras.")
     cam_id = cam_ids[0]
-    itval = int(interval)
+    itval = float(interval)
     cam = VideoCapture(cam_id)
     if not cam.isOpened():
-        raise RuntimeError("Can't open camera, device id: %d" % cam_id)
+        raise RuntimeError("Can't open camera, device id: " + str(cam_id))
     fps = cam.FPS if itval == 0 else 1000/itval
     cam_w, cam_h = cam.shape
     KeepResol = False
-    if record:
+    if motion and pre is None:
+        pre = 0.
+    if record or pre is not None:
         saveto = Path(saveto)
         fourcc, suffix = CODEC[quality]
         if not saveto.suffix:  # Suppose to be a dictionary
             saveto = saveto / "VID_cam{}_{}{}".format(
-                cam.ID, datetime.now().strftime("%Y%m%d-%H%M%S"), suffix)
+                _file_name(cam.ID), datetime.now().strftime("%Y%m%d-%H%M%S"), suffix)
         elif saveto.suffix != suffix:
             warn("Fourcc codec '" + fourcc + "' does't match suffix '" + saveto.suffix
                  + "', change save path to " + str(saveto.with_suffix(suffix)))
             saveto = saveto.with_suffix(suffix)
-        out = VideoWriter(saveto, fourcc, fps, (cam_w, cam_h))
+        out = open_writer(saveto, fourcc, fps, (cam_w, cam_h), segment=segment, keep=keep,
+                          pre=pre, post=post, jpeg=jpeg,
+                          detector=MotionDetector() if motion else None,
+                          stamp=TimeStamp() if stamp else None)
         print("Save to", out.path)
-        itval = 1
+        if pre is not None:
+            print("Keep %d frames before triggers, press t to trigger." % out.ring.capacity)
+        itval = 0   # record as fast as the camera
     else:
-        out = FakeWriter()
-        itval = int(1000/fps if itval == 0 else itval)
+        out = None
+
+    def process(frame):
+        # Runs on the capture thread, sees the latest flags of the main loop.
+        if flip:
+            frame = cv2.flip(frame, 1)
+        if KeepResol:
+            frame = adjustSize(frame, cam_w, cam_h)
+        return frame
+
+    recorder = PipelinedRecorder(cam, out, process, itval)
+    frame = None
     try:
         init_window(fixedsize, get_proper_size(
             cam_w, cam_h), cam, cam_ids, 0)
+        recorder.start()
         while cam.isOpened():
-            ret, frame = cam.read()
-            if ret and frame.shape > (0, 0):
-                if flip:
-                    frame = cv2.flip(frame, 1)
-                if KeepResol:
-                    frame = adjustSize(frame, cam_w, cam_h)
-                cv2.imshow(WIN_NAME, frame)
-            else:
-                warn("[!]No responding from camera " + str(cam.ID))
-                continue
-            out.write(frame)
-            pressed = cv2.waitKey(itval)
+            latest = recorder.preview(0.1)
+            if latest is not None:
+                frame = latest
+                with recorder.chrono("display"):
+                    cv2.imshow(WIN_NAME, frame)
+            pressed = cv2.waitKey(1)
             # Close Button Clicked
             if cv2.getWindowProperty(WIN_NAME, cv2.WND_PROP_VISIBLE) < 1:
                 break
@@ -354,7 +1019,14 @@ def cam_record(cam_ids=None, record=False,
                 helpMsg = HELP_MSG.format(
                     CamCount=min(9, len(cam_ids)-1), KeepResol="ON" if KeepResol else "OFF")
                 cv2.displayOverlay(WIN_NAME, helpMsg, 5000)
-            elif pressed == ord("s"):
+            elif pressed == ord("i"):
+                cv2.displayOverlay(WIN_NAME, "\n".join(
+                    [str(st) for st in recorder.stats.values()] + [str(recorder.chrono)] +
+                    ([str(out)] if isinstance(out, TriggeredWriter) else [])), 5000)
+            elif pressed == ord("t") and isinstance(out, TriggeredWriter):
+                out.trigger()
+                cv2.displayStatusBar(WIN_NAME, "Triggered, recording to " + str(out.path), 2000)
+            elif pressed == ord("s") and frame is not None:
                 path = os.path.join(
                     PICTURE, "IMG_cam"+str(cam_id) + datetime.now().strftime("%Y%m%d-%H%M%S")+".jpg")
                 cv2.imwrite(path, frame)
@@ -390,16 +1062,24 @@ def cam_record(cam_ids=None, record=False,
                 print(pressed, chr(pressed))
 
     finally:
-        out.release()
+        recorder.stop()
+        if out is not None:
+            out.release()
         cv2.destroyAllWindows()
+        for st in recorder.stats.values():
+            print(st)
+        print(recorder.chrono)
+        if isinstance(out, TriggeredWriter):
+            print(out)
 
 
 def cam_record_cmd():
     DEFAULT_SAVE_TO = VIDEO
     parser = argparse.ArgumentParser(prog="python -m qxtoolkit",
         description="A simple camera recorder, support Windows, MacOS and Linux.")
-    parser.add_argument("cam_ids", nargs="*", type=int,
-                        help="The camera's device IDs, can be either a nuber or serveral numbers separated by space.")
+    parser.add_argument("cam_ids", nargs="*", type=lambda s: int(s) if s.isdigit() else s,
+                        help="The camera's device IDs, can be either a nuber or serveral numbers separated by space."
+                        " A capture uri like synthetic:lissajous?fps=120 is also accepted.")
     parser.add_argument("-r", "--record", action="store_true",
                         help="Whether to record video to a file or not.")
     parser.add_argument("-t", "--saveto", default=DEFAULT_SAVE_TO,
@@ -412,14 +1092,38 @@ def cam_record_cmd():
                         help="Flip video around vertical axes.")
     parser.add_argument("-s", "--fixedsize", action="store_true",
                         help="Fixed preview windows in original size rather than fit the screen.")
+    parser.add_argument("-a", "--all", action="store_true",
+                        help="Record all cameras at the same time without preview, stop by Ctrl+C.")
+    parser.add_argument("-d", "--duration", type=float, default=None,
+                        help="Seconds to record with --all, default is until Ctrl+C.")
+    parser.add_argument("-S", "--segment", type=float, default=None,
+                        help="Split recorded videos into segments of this many seconds.")
+    parser.add_argument("-k", "--keep", type=int, default=None,
+                        help="Count of segments to keep with --segment, older ones are deleted.")
+    parser.add_argument("-p", "--pre", type=float, default=None,
+                        help="Triggered recording: keep this many seconds before a trigger (press t),"
+                        " and only record around triggers.")
+    parser.add_argument("--post", type=float, default=5.,
+                        help="Seconds to record after the last trigger with --pre.")
+    parser.add_argument("--jpeg", type=int, default=None,
+                        help="Keep frames before triggers as JPEG of this quality, to save memory.")
+    parser.add_argument("-m", "--motion", action="store_true",
+                        help="Trigger recording by motion, keeping --pre seconds before it.")
+    parser.add_argument("-T", "--stamp", action="store_true",
+                        help="Burn the date and time into recorded videos.")
     parser.add_argument("-V", "--version",
                         action="store_true", help="Show version.")
     args = parser.parse_args()
     if args.version:
         print(__version__)
         exit()
+    if args.all:
+        multi_record(args.cam_ids, args.saveto, args.quality, args.duration,
+                     args.segment, args.keep, args.pre, args.post, args.motion, args.stamp)
+        return
     cam_record(args.cam_ids, args.record, args.saveto, args.quality,
-               args.interval, args.flip, args.fixedsize)
+               args.interval, args.flip, args.fixedsize, args.segment, args.keep,
+               args.pre, args.post, args.jpeg, args.motion, args.stamp)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,198 @@
+#! /usr/bin/env python
+'''
+Description : Pluggable capture backends, and a synthetic camera to test without devices.
+FilePath    : /qxtoolkit/qxtoolkit/capture.py
+Author      : qxsoftware@163.com
+Date        : 2026-10-18 11:20:36
+LastEditTime: 2026-10-18 11:20:36
+Refer to    : https://github.com/QixuanAI/qxtoolkit
+'''
+
+import re
+import time
+import cv2
+import numpy as np
+from urllib.parse import urlsplit, parse_qsl
+try:  # for package import
+    from . import gen_samples
+except ImportError:  # for directly running
+    import gen_samples
+
+__all__ = ["open_capture", "register_backend", "is_capture_uri", "SyntheticCapture"]
+
+_BACKENDS = {}
+
+
+def register_backend(scheme: str, factory):
+    """Make open_capture("<scheme>:...") return factory("<scheme>:...").
+    The returned object should act like a cv2.VideoCapture."""
+    _BACKENDS[scheme] = factory
+
+
+def is_capture_uri(src) -> bool:
+    """True if src is handled by a registered backend."""
+    return isinstance(src, str) and src.split(":", 1)[0] in _BACKENDS
+
+
+def open_capture(src):
+    """
+    Open a capture like cv2.VideoCapture(src), where src can be
+        a camera device number (int or digits),
+        "<scheme>:..." of a registered backend, like "synthetic:lissajous?fps=120",
+        or anything cv2.VideoCapture accepts, like a video file.
+    """
+    if isinstance(src, str):
+        if re.match("[0-9]+$", src) is not None:
+            src = int(src)
+        elif is_capture_uri(src):
+            return _BACKENDS[src.split(":", 1)[0]](src)
+    return cv2.VideoCapture(src)
+
+
+PATTERNS = {  # name: a function of the frame size (width, height) returning frames
+    "lissajous": lambda size: gen_samples.gen_rgb_lissajous_curve_imgs(randFreq=False, size=size),
+    "spiral": lambda size: gen_samples.gen_rgb_spiral_curve_imgs(size=size),
+    "gray": lambda size: gen_samples.gen_gray_level_calib_imgs(size=size),
+    "rgb": lambda size: gen_samples.gen_rgb_level_calib_imgs(size=size),
+}
+
+
+class SyntheticCapture:
+    """
+    A fake camera acting like cv2.VideoCapture. It loops over `loop` frames of a
+    gen_samples pattern or a video file, rendered once in the target size, and
+    delivers them on a real-time clock with optional jitter and dropped frames.
+    Open it by open_capture("synthetic:<source>?width=3840&height=2160&fps=120&jitter=0.002&dropout=0.01"),
+    or in cam_record and ImagesGetter by the same string.
+    """
+
+    def __init__(self, source="lissajous", width=640, height=480, fps=30., jitter=0.,
+                 dropout=0., loop=60, realtime=True, seed=0):
+        """
+        Args:
+            @source: a key of PATTERNS, or a path to a video file.
+            @jitter: standard deviation in seconds of the delay of every frame.
+            @dropout: probability of a frame being lost, read() then returns the next one
+                        and POS_FRAMES skips, like a camera dropping frames.
+            @loop: count of distinct frames to render.
+            @realtime: If False, frames are delivered as fast as they are read.
+        """
+        self.source = source
+        self.fps = float(fps)
+        self.jitter = float(jitter)
+        self.dropout = float(dropout)
+        self.loop = int(loop)
+        self.realtime = realtime
+        self._rng = np.random.default_rng(seed)
+        self._frames = []
+        self._opened = True
+        self._resize(int(width), int(height))
+        self._pos = 0       # index of the next frame
+        self._t0 = None     # monotonic time of frame 0
+        self.lost = 0       # frames dropped, by dropout or by reading too slowly
+
+    @classmethod
+    def from_uri(cls, uri: str):
+        parts = urlsplit(uri)
+        kwargs = dict(parse_qsl(parts.query))
+        for k in ("width", "height", "loop", "seed"):
+            if k in kwargs:
+                kwargs[k] = int(kwargs[k])
+        for k in ("fps", "jitter", "dropout"):
+            if k in kwargs:
+                kwargs[k] = float(kwargs[k])
+        if "realtime" in kwargs:
+            kwargs["realtime"] = kwargs["realtime"].lower() not in ("0", "false", "no")
+        return cls(parts.path or "lissajous", **kwargs)
+
+    def _render(self):
+        """Yield source frames as 8-bit BGR images."""
+        if self.source in PATTERNS:
+            for img in PATTERNS[self.source]((self.width, self.height)):
+                if img.shape[2] == 1:
+                    img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+                yield img
+        else:
+            cap = cv2.VideoCapture(self.source)
+            while True:
+                ret, img = cap.read()
+                if not ret:
+                    break
+                yield img
+            cap.release()
+
+    def _resize(self, width, height):
+        self.width, self.height = width, height
+        self._frames = []
+        for img in self._render():
+            self._frames.append(cv2.resize(img, (width, height)))
+            if len(self._frames) >= self.loop:
+                break
+        if not self._frames:
+            self._opened = False
+
+    def isOpened(self):
+        return self._opened
+
+    def release(self):
+        self._opened = False
+
+    def grab(self):
+        if not self._opened:
+            return False
+        if self._t0 is None:
+            self._t0 = time.monotonic()
+        if self.realtime:
+            # Like a camera, frames produced while nobody reads are lost.
+            latest = int((time.monotonic() - self._t0) * self.fps)
+            if latest > self._pos:
+                self.lost += latest - self._pos
+                self._pos = latest
+        while self.dropout > 0 and self._rng.random() < self.dropout:
+            self._pos += 1
+            self.lost += 1
+        if self.realtime:
+            due = self._t0 + self._pos / self.fps
+            if self.jitter > 0:
+                due += abs(self._rng.normal(0, self.jitter))
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        self._pos += 1
+        return True
+
+    def retrieve(self, image=None):
+        frame = self._frames[(self._pos - 1) % len(self._frames)]
+        if image is not None and image.shape == frame.shape and image.dtype == frame.dtype:
+            np.copyto(image, frame)
+            return True, image
+        return True, frame.copy()
+
+    def read(self, image=None):
+        if not self.grab():
+            return False, None
+        return self.retrieve(image)
+
+    def get(self, propId):
+        return {
+            cv2.CAP_PROP_FRAME_WIDTH: self.width,
+            cv2.CAP_PROP_FRAME_HEIGHT: self.height,
+            cv2.CAP_PROP_FPS: self.fps,
+            cv2.CAP_PROP_POS_FRAMES: self._pos,
+            cv2.CAP_PROP_POS_MSEC: max(self._pos - 1, 0) * 1000. / self.fps,  # of the last frame read
+            cv2.CAP_PROP_FRAME_COUNT: -1,
+        }.get(propId, 0.)
+
+    def set(self, propId, value):
+        if propId == cv2.CAP_PROP_FPS and value > 0:
+            self.fps = float(value)
+        elif propId == cv2.CAP_PROP_FRAME_WIDTH:
+            self._resize(int(value), self.height)
+        elif propId == cv2.CAP_PROP_FRAME_HEIGHT:
+            self._resize(self.width, int(value))
+        else:
+            return False
+        return True
+
+
+register_backend("synthetic", SyntheticCapture.from_uri)
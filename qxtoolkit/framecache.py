@@ -0,0 +1,138 @@
+#! /usr/bin/env python
+'''
+Description : Decode a video once, then replay its frames from a memory-mapped raw file.
+FilePath    : /qxtoolkit/qxtoolkit/framecache.py
+Author      : qxsoftware@163.com
+Date        : 2026-10-18 10:41:55
+LastEditTime: 2026-10-18 10:41:55
+Refer to    : https://github.com/QixuanAI/qxtoolkit
+'''
+
+import os
+import json
+import hashlib
+import numpy as np
+from pathlib import Path
+
+__all__ = ["FrameCache"]
+
+MAGIC = b"QXFRAMES"
+HEADER_SIZE = 4096  # keeps frames page aligned in the mapping
+SUFFIX = ".frames"
+
+
+class FrameCache:
+    """
+    A folder of raw frame files, one per source video. A file is a header with
+    shape, dtype, fps and count, followed by the frames as one C-contiguous array.
+    Files are keyed by the path, size and mtime of the source, so a changed video
+    is decoded again. The least recently used files are deleted when the folder
+    grows over `limit` bytes.
+    """
+
+    def __init__(self, folder, limit=16 << 30):
+        self.folder = Path(folder)
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self.limit = limit
+
+    def _source_info(self, src):
+        src = os.path.abspath(src)
+        stat = os.stat(src)
+        return {"src": src, "size": stat.st_size, "mtime": stat.st_mtime_ns}
+
+    def path(self, src) -> Path:
+        """Path of the cache file for a source video."""
+        info = self._source_info(src)
+        key = hashlib.sha1(json.dumps(info, sort_keys=True).encode()).hexdigest()
+        return self.folder / (key + SUFFIX)
+
+    def load(self, src):
+        """Return (frames, fps) of a cached video, frames is a read-only np.memmap
+        shaped (count, H, W, C). Return None if the video is not cached yet."""
+        path = self.path(src)
+        try:
+            with open(path, "rb") as f:
+                head = f.read(HEADER_SIZE)
+        except OSError:
+            return None
+        if not head.startswith(MAGIC):
+            return None
+        info = json.loads(head[len(MAGIC):].rstrip(b"\0"))
+        if {k: info.get(k) for k in ("src", "size", "mtime")} != self._source_info(src) \
+                or info["count"] <= 0:
+            return None
+        os.utime(path)  # mark as recently used
+        frames = np.memmap(path, dtype=info["dtype"], mode="r", offset=HEADER_SIZE,
+                           shape=(info["count"],) + tuple(info["shape"]))
+        return frames, info["fps"]
+
+    def writer(self, src, fps):
+        """Return a FrameCacheWriter, frames written to it are cached for `src`
+        after it is committed."""
+        return FrameCacheWriter(self, src, fps)
+
+    def evict(self, keep=None):
+        """Delete the least recently used files until the folder fits the limit."""
+        files = sorted(self.folder.glob("*" + SUFFIX), key=lambda p: p.stat().st_mtime)
+        total = sum(p.stat().st_size for p in files)
+        for p in files:
+            if total <= self.limit:
+                break
+            if p == keep:
+                continue
+            total -= p.stat().st_size
+            p.unlink()
+
+    def clear(self):
+        for p in self.folder.glob("*" + SUFFIX):
+            p.unlink()
+
+
+class FrameCacheWriter:
+    """Append frames to a temporary file, which becomes a cache file on commit()."""
+
+    def __init__(self, cache: FrameCache, src, fps):
+        self.cache = cache
+        self.info = dict(cache._source_info(src), fps=fps, count=0, shape=None, dtype=None)
+        self.path = cache.path(src)
+        self._tmp = self.path.with_suffix(".part%d" % os.getpid())
+        self._file = open(self._tmp, "wb")
+        self._file.write(b"\0" * HEADER_SIZE)
+
+    def write(self, frame: np.ndarray):
+        if self._file is None:  # aborted, e.g. by a frame of another shape
+            return
+        if self.info["shape"] is None:
+            self.info["shape"], self.info["dtype"] = list(frame.shape), frame.dtype.str
+        elif list(frame.shape) != self.info["shape"] or frame.dtype.str != self.info["dtype"]:
+            self.abort()
+            return
+        self._file.write(np.ascontiguousarray(frame).data)
+        self.info["count"] += 1
+
+    @property
+    def isOpened(self) -> bool:
+        return self._file is not None
+
+    def commit(self):
+        """Finish the file and move it into the cache."""
+        if self._file is None:
+            return
+        if self.info["count"] == 0:
+            return self.abort()
+        head = MAGIC + json.dumps(self.info).encode()
+        assert len(head) <= HEADER_SIZE, "Header of frame cache is too long."
+        self._file.seek(0)
+        self._file.write(head)
+        self._file.close()
+        self._file = None
+        os.replace(self._tmp, self.path)
+        self.cache.evict(keep=self.path)
+
+    def abort(self):
+        """Drop the frames written, e.g. when the video was not read to the end."""
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        self._tmp.unlink()
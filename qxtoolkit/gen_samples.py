@@ -9,173 +9,481 @@ Refer to    : https://github.com/QixuanAI/qxtoolkit
 '''
 import os
 import cv2
+import bisect
+import shutil
 import argparse
+import subprocess
 import numpy as np
 from pathlib import Path
+from collections import deque
 from warnings import warn
+from concurrent.futures import ProcessPoolExecutor
+try:  # for package import
+    from ._inner import FOURCC_CODEC
+except ImportError:  # for directly running
+    from _inner import FOURCC_CODEC
 from datetime import datetime
 
 __all__ = [
+    "CalibPatterns",
     "gen_gray_level_calib_imgs",
     "gen_rgb_level_calib_imgs",
     "gen_rgb_spiral_curve_imgs",
     "gen_rgb_lissajous_curve_imgs",
+    "SpiralCurve",
+    "LissajousCurve",
+    "render_video",
+    "gen_video",
 ]
 
 
-def _get_param(bits, channel):
+def _get_param(bits, channel, size=None):
+    """Return max count of levels, shape of images and dtype for a bit depth.
+    Images are maxval x maxval if size (width, height) is not given."""
     maxval = 1 << bits
-    shape = (maxval, maxval, channel)
-    if bits == 8:
+    width, height = size if size is not None else (maxval, maxval)
+    shape = (height, width, channel)
+    if bits <= 8:
         dtype = np.uint8
-    elif bits == 16:
+    elif bits <= 16:
         dtype = np.uint16
+    else:
+        raise ValueError("bits should be no more than 16.")
     return maxval, shape, dtype
 
 
-def gen_gray_level_calib_imgs(bits=8):
-    maxval, shape, dtype = _get_param(bits, 1)
-    for i in range(maxval):
-        img = np.full(shape, i, dtype=dtype)
-        yield img
-    img = np.zeros(shape, dtype=dtype)
-    for i in range(maxval):
-        yield img
-        img[:, -i:, :] += 1
-    img = np.zeros(shape, dtype=dtype)
-    for i in range(maxval):
-        yield img
-        img[-i:, :, :] += 1
-    img = np.zeros(shape, dtype=dtype)
-    for i in range(maxval):
-        yield img
-        img[-i:, -i:, :] += 1
-    img = np.zeros(shape, dtype=dtype)
-    for i in range(maxval//2):
-        yield img
-        img[:, maxval-i*2-1, :] = maxval-1
-    img = np.zeros(shape, dtype=dtype)
-    for i in range(maxval//2):
-        yield img
-        img[maxval-i*2-1, :, :] = maxval-1
-    img = np.zeros(shape, dtype=dtype)
-    for i in range(maxval//2):
-        yield img
-        img[:, maxval-i*2-1, :] = maxval-1
-        img[maxval-i*2-1, :, :] = maxval-1
-
-
-def gen_rgb_level_calib_imgs(bits=8):
-    maxval, shape, dtype = _get_param(bits, 3)
-    for c in (0, 1, 2):
-        img = np.zeros(shape, dtype=dtype)
-        for i in range(maxval):
-            yield img
-            img[:, :, c] += 1
-    for c in (0, 1, 2):
-        img = np.zeros(shape, dtype=dtype)
-        for i in range(maxval):
-            yield img
-            img[:, -i:, c] += 1
-    for c in (0, 1, 2):
-        img = np.zeros(shape, dtype=dtype)
-        for i in range(maxval):
-            yield img
-            img[-i:, :, c] += 1
-    for c in (0, 1, 2):
-        img = np.zeros(shape, dtype=dtype)
-        for i in range(maxval):
-            yield img
-            img[-i:, -i:, c] += 1
-    for c in (0, 1, 2):
-        img = np.zeros(shape, dtype=dtype)
-        for i in range(maxval//2):
-            yield img
-            img[:, maxval-i*2-1, c] = maxval-1
-    for c in (0, 1, 2):
-        img = np.zeros(shape, dtype=dtype)
-        for i in range(maxval//2):
-            yield img
-            img[maxval-i*2-1, :, c] = maxval-1
-    for c in (0, 1, 2):
-        img = np.zeros(shape, dtype=dtype)
-        for i in range(maxval//2):
-            yield img
-            img[:, maxval-i*2-1, c] = maxval-1
-            img[maxval-i*2-1, :, c] = maxval-1
-
-
-def gen_rgb_spiral_curve_imgs(speed=0.5, angle=-5, circleCount=100, smooth=100, bits=8):
+class CalibPatterns:
+    """
+    Calibration patterns of every level of a bit depth, as a sequence of frames:
+        level       flat images of level i
+        hramp       a horizontal ramp sliding in from the right, 0..i
+        vramp       a vertical ramp sliding in from the bottom
+        dramp       a ramp of both directions sliding in from the bottom right
+        vstripes    i white one-level-wide columns, added from the right
+        hstripes    i white rows, added from the bottom
+        grid        both of them
+    Gray patterns have one channel. RGB patterns draw each of them in the blue, green
+    and red channel in turn. Levels map to pixels by index functions, so any output
+    size works for any bit depth, and frame k is computed directly by patterns[k].
+    """
+    KINDS = ("level", "hramp", "vramp", "dramp", "vstripes", "hstripes", "grid")
+
+    def __init__(self, bits=8, rgb=False, size=(256, 256), readonly=False):
+        """
+        Args:
+            @bits: bit depth, 8 or 16 makes uint8 or uint16 images.
+            @rgb: Draw patterns in each of BGR channels rather than a gray channel.
+            @size: (width, height) of images, None means (2**bits, 2**bits).
+            @readonly: Return read-only broadcast views instead of new arrays where the
+                        pattern is the same along rows or columns, which costs no memory
+                        per frame. Use np.ascontiguousarray() if a library needs a copy.
+        """
+        self.maxval, self.shape, self.dtype = _get_param(bits, 3 if rgb else 1, size)
+        self.readonly = readonly
+        height, width = self.shape[:2]
+        m = self.maxval
+        # Level of every column and row, the center of the levels a pixel covers.
+        self._u = (np.arange(width) * 2 + 1) * m // (2 * width)
+        self._v = (np.arange(height) * 2 + 1) * m // (2 * height)
+        self._sections = []  # (first frame, kind, channel, count)
+        first = 0
+        for kind in self.KINDS:
+            count = m if kind.endswith(("level", "ramp")) else m // 2
+            for c in range(self.shape[2]):
+                self._sections.append((first, kind, c, count))
+                first += count
+        self._len = first
+        self._firsts = [s[0] for s in self._sections]
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        for k in range(self._len):
+            yield self[k]
+
+    def __getitem__(self, k):
+        if k < 0:
+            k += self._len
+        if not 0 <= k < self._len:
+            raise IndexError("Frame index out of range.")
+        i = bisect.bisect_right(self._firsts, k) - 1
+        first, kind, c, _ = self._sections[i]
+        return self._render(kind, c, k - first)
+
+    def _render(self, kind, c, i):
+        m, top = self.maxval, self.maxval - 1
+        u, v = self._u, self._v
+        rows = cols = None  # values along rows and columns, or a 2D plane
+        if kind == "level":
+            plane = np.full((1, 1), i)
+        elif kind == "hramp":
+            plane = np.maximum(0, i - (top - u))[None, :]
+        elif kind == "vramp":
+            plane = np.maximum(0, i - (top - v))[:, None]
+        elif kind == "dramp":
+            plane = np.maximum(0, i - (top - np.minimum.outer(v, u)))
+        else:
+            cols = np.where(((top - u) % 2 == 0) & (top - u < 2 * i), top, 0)
+            rows = np.where(((top - v) % 2 == 0) & (top - v < 2 * i), top, 0)
+            if kind == "vstripes":
+                plane = cols[None, :]
+            elif kind == "hstripes":
+                plane = rows[:, None]
+            else:
+                plane = np.maximum.outer(rows, cols)
+        small = np.zeros(plane.shape + (self.shape[2],), self.dtype)
+        small[..., c] = np.minimum(plane, m - 1)
+        if self.readonly and (small.shape[0] == 1 or small.shape[1] == 1):
+            return np.broadcast_to(small, self.shape)
+        if small.shape == self.shape:
+            frame = small
+        else:
+            frame = np.empty(self.shape, self.dtype)
+            frame[...] = small
+        if self.readonly:
+            frame.flags.writeable = False
+        return frame
+
+
+def gen_gray_level_calib_imgs(bits=8, size=(256, 256), readonly=False):
+    """Yield gray calibration patterns, see CalibPatterns. A frame is never reused."""
+    yield from CalibPatterns(bits, False, size, readonly)
+
+
+def gen_rgb_level_calib_imgs(bits=8, size=(256, 256), readonly=False):
+    """Yield calibration patterns of each BGR channel, see CalibPatterns."""
+    yield from CalibPatterns(bits, True, size, readonly)
+
+
+def _hsv_color(h, dtype):
+    """BGR color of hue h at full saturation and value, as cv2 would convert it, for
+    drawing straight into a BGR image instead of converting the whole image."""
+    hsv = np.array([[[min(max(int(round(h)), 0), 255), 255, 255]]], np.uint8)
+    bgr = cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)[0, 0].astype(np.int64)
+    if dtype == np.uint16:
+        bgr *= 257
+    return tuple(int(c) for c in bgr)
+
+
+class Curve:
+    """
+    Base of animated curves, frame k is rendered directly by curve[k]. The geometry
+    tables are computed once, so a frame costs a few vector operations and a polyline.
+    """
+
+    def __init__(self, count, bits=8, size=(256, 256), thickness=2, reuse=0):
+        """
+        Args:
+            @count: count of frames.
+            @size: (width, height) of images, None means (2**bits, 2**bits).
+            @reuse: If > 0, draw into a ring of this many canvases instead of a new
+                        image per frame, a frame will be overwritten after `reuse` more.
+        """
+        self.maxval, self.shape, self.dtype = _get_param(bits, 3, size)
+        self.count = count
+        self.thickness = thickness
+        self.reuse = reuse
+        self._canvases = deque()
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for k in range(self.count):
+            yield self[k]
+
+    def __getitem__(self, k):
+        if k < 0:
+            k += self.count
+        if not 0 <= k < self.count:
+            raise IndexError("Frame index out of range.")
+        img = self._take()
+        pts, hue = self._points(k)
+        cv2.polylines(img, [pts], False, _hsv_color(hue, self.dtype), thickness=self.thickness)
+        return img
+
+    def _take(self):
+        if self.reuse <= 0:
+            return np.zeros(self.shape, self.dtype)
+        if len(self._canvases) < self.reuse:
+            self._canvases.append(np.zeros(self.shape, self.dtype))
+        else:
+            self._canvases.rotate(-1)
+            self._canvases[-1].fill(0)
+        return self._canvases[-1]
+
+    def _points(self, k):
+        """Return the int32 points of the curve and its hue at frame k."""
+        raise NotImplementedError
+
+    def __getstate__(self):  # canvases are not worth sending to other processes
+        state = self.__dict__.copy()
+        state["_canvases"] = deque()
+        return state
+
+
+class SpiralCurve(Curve):
     """
     绘制等角螺线
+    The spiral of frame k is the first part of one long spiral rotated by its phase,
+    so only the tables of that spiral are computed, once.
+    """
+
+    def __init__(self, speed=0.5, angle=-5, circleCount=100, smooth=100, bits=8,
+                 size=(256, 256), thickness=2, reuse=0):
+        """
+        @speed:转速
+        @angle:等角螺线偏离角度
+        @circleCount:结束时的总圈数
+        @smooth:螺线的光滑程度，值越大越光滑
+        @bits:图像位数
+        """
+        super().__init__(circleCount * 100, bits, size, thickness, reuse)
+        self.speed = speed
+        self.smooth = smooth
+        rad = np.radians(90+angle)  # 螺线固定角度，大于90度为顺时针，小于为逆时针
+        most = int((1+speed*(self.count-1)/100)*smooth)
+        # r = rad*exp(theta/tan(rad)), scaled by its max, keeps exp(theta/tan(rad) - max)
+        self._theta = np.arange(most) * (2*np.pi/smooth)
+        self._logr = self._theta / np.tan(rad)
+        self._cos = np.cos(self._theta)
+        self._sin = np.sin(self._theta)
+        self._buf = np.empty((3, most))
+
+    def _points(self, k):
+        circle_num = 1+self.speed*k/100  # 圈数
+        phase = self.speed*k/500  # 相位
+        n = max(int(circle_num*self.smooth), 2)
+        logr, r, x, y = self._logr[:n], self._buf[0, :n], self._buf[1, :n], self._buf[2, :n]
+        np.exp(logr - max(logr[0], logr[-1]), out=r)
+        height, width = self.shape[:2]
+        r *= min(width, height)/2.1
+        # rotate by the phase: cos(t+p) = cos(t)cos(p) - sin(t)sin(p)
+        cp, sp = np.cos(phase*2*np.pi), np.sin(phase*2*np.pi)
+        np.multiply(self._cos[:n], cp, out=x)
+        x -= self._sin[:n]*sp
+        x *= r
+        x += width/2
+        np.multiply(self._sin[:n], cp, out=y)
+        y += self._cos[:n]*sp
+        y *= r
+        y += height/2
+        pts = np.stack((x.astype(np.int32), y.astype(np.int32)), -1)
+        return pts, 128-128*np.cos(phase)
+
+
+class LissajousCurve(Curve):
+    """A Lissajous curve with a moving phase, x of the curve is the same for all frames."""
+
+    def __init__(self, freq=5.0, randFreq=True, cycles=3, smooth=500, bits=8,
+                 size=(256, 256), thickness=2, reuse=0, count=10000, seed=None):
+        """
+        @randFreq: multiply freq by a random number in [0, 1).
+        @seed: seed of the random number, None means a different one every time.
+        """
+        super().__init__(count, bits, size, thickness, reuse)
+        if randFreq:
+            freq *= np.random.default_rng(seed).random()
+        self.freq = freq
+        height, width = self.shape[:2]
+        t = np.linspace(0, cycles*2*np.pi, smooth)
+        self._x = (width/2*np.sin(t)+width/2).astype(np.int32)
+        # sin(t*freq + phase) = sin(t*freq)cos(phase) + cos(t*freq)sin(phase)
+        self._sin = height/2*np.sin(t*freq)
+        self._cos = height/2*np.cos(t*freq)
+        self._y = np.empty(smooth)
+        self._pts = np.empty((smooth, 2), np.int32)
+        self._pts[:, 0] = self._x
+
+    def _points(self, k):
+        phase = k/100  # 相位
+        np.multiply(self._sin, np.cos(phase), out=self._y)
+        self._y += self._cos*np.sin(phase)
+        self._y += self.shape[0]/2
+        self._pts[:, 1] = self._y
+        return self._pts, 128-128*np.cos(phase/self.freq)
+
+
+def gen_rgb_spiral_curve_imgs(speed=0.5, angle=-5, circleCount=100, smooth=100, bits=8,
+                              size=(256, 256), reuse=0):
+    """
+    绘制等角螺线, see SpiralCurve.
     @speed:转速
     @angle:等角螺线偏离角度
     @circleCount:结束时的总圈数
     @smooth:螺线的光滑程度，值越大越光滑
     @bits:图像位数
     """
-    maxval, shape, dtype = _get_param(bits, 3)
-    center = (shape[0]//2, shape[1]//2)  # 中心坐标
-    rad = np.radians(90+angle)  # 螺线固定角度，大于90度为顺时针，小于为逆时针
-    for i in range(circleCount*100):
-        circle_num = 1+speed*i/100  # 圈数
-        phase = speed*i/500  # 相位
-        # 极坐标
-        theta = np.linspace(0, circle_num*2*np.pi,
-                            int(circle_num*smooth))+phase*2*np.pi  # 角度
-        r = rad*np.exp(theta/np.tan(rad))  # 距离
-        # 极坐标转直角坐标
-        x = r*np.cos(theta)
-        y = r*np.sin(theta)
-        scale = (maxval/2.1)/r.max()
-        x = x*scale+center[0]
-        y = y*scale+center[1]
-        h, s, v = 128-128*np.cos(phase), 255, 255
-        pts = np.stack((x.astype(np.int), y.astype(np.int)), -1)
-        img = np.zeros(shape, dtype=dtype)
-        img = cv2.polylines(img, [pts], False, (h, s, v), thickness=2)
-        img = cv2.cvtColor(img, cv2.COLOR_HSV2BGR)
-        yield img
-
-
-def gen_rgb_lissajous_curve_imgs(freq=5.0, randFreq=True, cycles=3, smooth=500, bits=8):
-    maxval, shape, dtype = _get_param(bits, 3)
-    center = (shape[0]//2, shape[1]//2)  # 中心坐标
-    if randFreq:
-        freq *= np.random.rand()
-    for i in range(10000):
-        phase = i/100  # 相位
-        t = np.linspace(0, cycles*2*np.pi, smooth)
-        x = maxval/2*np.sin(t)+center[0]
-        y = maxval/2*np.sin(t*freq+phase)+center[1]
-        h, s, v = 128-128*np.cos(phase/freq), 255, 255
-        pts = np.stack((x.astype(np.int), y.astype(np.int)), -1)
-        img = np.zeros(shape, dtype=dtype)
-        img = cv2.polylines(img, [pts], False, (h, s, v), thickness=2)
-        img = cv2.cvtColor(img, cv2.COLOR_HSV2BGR)
-        yield img
+    yield from SpiralCurve(speed, angle, circleCount, smooth, bits, size, reuse=reuse)
 
 
-if __name__ == "__main__":
-    import sys
-    from _inner import FOURCC_CODEC
-    getter = gen_rgb_lissajous_curve_imgs
-    delay = 1
-    save = True
-    if save:
-        path = "sample.mp4"
-        fourcc = cv2.VideoWriter_fourcc(*FOURCC_CODEC["small"][0])
-        out = cv2.VideoWriter(path, fourcc, 25, (256, 256))
-    cv2.namedWindow('press q to quit', cv2.WINDOW_NORMAL)
-    for i, img in enumerate(getter(bits=8)):
-        if img is None:
-            print(i, ' - None to show')
-            continue
-        print(i, end='\r')
-        cv2.imshow('press q to quit', img)
-        if save:
-            out.write(img)
-        if cv2.waitKey(delay) == ord('q'):
-            break
-    if save:
+def gen_rgb_lissajous_curve_imgs(freq=5.0, randFreq=True, cycles=3, smooth=500, bits=8,
+                                 size=(256, 256), reuse=0, seed=None):
+    yield from LissajousCurve(freq, randFreq, cycles, smooth, bits, size, reuse=reuse, seed=seed)
+
+
+def _render_batch(frames, start, stop):
+    """Render frames[start:stop] into one array, in a worker process."""
+    first = frames[start]
+    batch = np.empty((stop - start,) + first.shape, first.dtype)
+    batch[0] = first
+    for k in range(start + 1, stop):
+        batch[k - start] = frames[k]
+    return batch
+
+
+def _to_bgr8(img):
+    """Make a frame writable by cv2.VideoWriter."""
+    if img.dtype == np.uint16:
+        img = (img >> 8).astype(np.uint8)
+    if img.shape[2] == 1:
+        img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+    return img
+
+
+def render_video(frames, path, fps=25, fourcc="mp4v", start=0, stop=None, workers=0, batch=32):
+    """
+    Render frames[start:stop] into a video file, e.g. render_video(SpiralCurve(), "spiral.mp4").
+    Args:
+        @frames: a CalibPatterns, a Curve, or anything with len() and random access by
+                    index which can be pickled.
+        @workers: Render batches of frames in this many processes, while this process
+                    encodes them in order. 0 means rendering in this process.
+        @batch: count of frames rendered by a worker at a time.
+    Return count of frames written.
+    """
+    stop = len(frames) if stop is None else min(stop, len(frames))
+    if stop <= start:
+        return 0
+    first = _to_bgr8(frames[start])
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    out = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*fourcc), fps,
+                          (first.shape[1], first.shape[0]))
+    if not out.isOpened():
+        raise RuntimeError("Can't open VideoWriter for " + str(path))
+    try:
+        if workers <= 0:
+            out.write(first)
+            for k in range(start + 1, stop):
+                out.write(_to_bgr8(frames[k]))
+        else:
+            with ProcessPoolExecutor(workers) as pool:
+                pending = deque()
+                chunks = iter(range(start, stop, batch))
+                for begin in chunks:
+                    pending.append(pool.submit(_render_batch, frames, begin, min(begin + batch, stop)))
+                    if len(pending) >= 2 * workers:  # bounds the frames in memory
+                        break
+                while pending:
+                    for img in pending.popleft().result():
+                        out.write(_to_bgr8(img))
+                    begin = next(chunks, None)
+                    if begin is not None:
+                        pending.append(pool.submit(
+                            _render_batch, frames, begin, min(begin + batch, stop)))
+    finally:
         out.release()
+    return stop - start
+
+
+class _Loop:
+    """frames looped to `count` frames."""
+
+    def __init__(self, frames, count):
+        self.frames = frames
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, k):
+        return self.frames[k % len(self.frames)]
+
+
+GENERATORS = {  # name: a function of (size, bits, seed) returning frames with random access
+    "gray": lambda size, bits, seed: CalibPatterns(bits, False, size),
+    "rgb": lambda size, bits, seed: CalibPatterns(bits, True, size),
+    "spiral": lambda size, bits, seed: SpiralCurve(bits=bits, size=size),
+    "lissajous": lambda size, bits, seed: LissajousCurve(bits=bits, size=size, seed=seed),
+}
+
+
+def _render_chunk(frames, path, fps, fourcc, start, stop):
+    return render_video(frames, path, fps, fourcc, start, stop)
+
+
+def gen_video(name, path, size=(640, 480), fps=25, count=None, codec="small", bits=8,
+              seed=0, workers=1, chunk=None):
+    """
+    Render a generator of GENERATORS into a video file.
+    With ffmpeg on PATH, the timeline is split into chunks which are rendered and
+    encoded by `workers` processes at the same time, then joined without re-encoding.
+    Without it, workers only render, and this process encodes all frames.
+    Args:
+        @count: count of frames, None means all frames of the generator, a larger count loops them.
+        @codec: a key of FOURCC_CODEC, the suffix of path is changed to match it.
+        @seed: seed of random parameters, the same seed renders the same video.
+        @chunk: frames per chunk, None splits the timeline evenly to workers.
+    Return the path of the video.
+    """
+    fourcc, suffix = FOURCC_CODEC[codec]
+    path = Path(path).with_suffix(suffix)
+    frames = GENERATORS[name](tuple(size), bits, seed)
+    count = len(frames) if count is None else count
+    frames = _Loop(frames, count)
+    ffmpeg = shutil.which("ffmpeg")
+    if workers <= 1 or ffmpeg is None:
+        if workers > 1:
+            warn("ffmpeg is not found, only rendering runs in parallel.")
+        render_video(frames, path, fps, fourcc, workers=workers if workers > 1 else 0)
+        return path
+    chunk = chunk or -(-count // workers)
+    parts = [path.with_name("%s.part%04d%s" % (path.stem, i, suffix))
+             for i in range(-(-count // chunk))]
+    listing = path.with_name(path.stem + ".parts.txt")
+    try:
+        with ProcessPoolExecutor(workers) as pool:
+            list(pool.map(_render_chunk, [frames] * len(parts), parts, [fps] * len(parts),
+                          [fourcc] * len(parts), range(0, count, chunk),
+                          range(chunk, count + chunk, chunk)))
+        listing.write_text("".join("file '%s'\n" % p.resolve() for p in parts))
+        subprocess.run([ffmpeg, "-y", "-loglevel", "error", "-f", "concat", "-safe", "0",
+                        "-i", str(listing), "-c", "copy", str(path)], check=True)
+    finally:
+        for p in parts + [listing]:
+            if p.exists():
+                p.unlink()
+    return path
+
+
+def gen_samples_cmd():
+    parser = argparse.ArgumentParser(prog="python -m qxtoolkit.gen_samples",
+        description="Render a synthetic test video without a window.")
+    parser.add_argument("generator", choices=GENERATORS.keys(), help="The pattern to render.")
+    parser.add_argument("-o", "--output", default=None,
+                        help="Path of the video, default is ./<generator>.<suffix of codec>.")
+    parser.add_argument("-s", "--size", default="640x480", help="Resolution as WIDTHxHEIGHT.")
+    parser.add_argument("-f", "--fps", type=float, default=25, help="Frames per second.")
+    parser.add_argument("-l", "--length", type=float, default=None,
+                        help="Seconds of the video, default is all frames of the generator.")
+    parser.add_argument("-c", "--codec", default="small", choices=FOURCC_CODEC.keys(),
+                        help="The codec of the video.")
+    parser.add_argument("-b", "--bits", type=int, default=8, choices=(8, 16),
+                        help="Bit depth of rendering, videos are saved in 8 bits.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of random parameters.")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1,
+                        help="Count of worker processes.")
+    parser.add_argument("--chunk", type=int, default=None, help="Frames per chunk of a worker.")
+    args = parser.parse_args()
+    size = tuple(int(v) for v in args.size.lower().split("x"))
+    count = None if args.length is None else int(round(args.length * args.fps))
+    output = args.output or args.generator
+    start = datetime.now()
+    path = gen_video(args.generator, output, size, args.fps, count, args.codec, args.bits,
+                     args.seed, args.workers, args.chunk)
+    print("Save to", path, "in", datetime.now() - start)
+
+
+if __name__ == "__main__":
+    gen_samples_cmd()
@@ -1,27 +1,380 @@
 #! /usr/bin/env python
 '''
-Description : 
+Description : Overlays of captions, sub-images and boxes on frames, timed by the frame time,
+              and a cache of rasterized text.
 FilePath    : /qxtoolkit/qxtoolkit/graffiti.py
 Author      : qxsoftware@163.com
 Date        : 2020-10-26 15:13:20
-LastEditTime: 2020-12-26 13:57:22
+LastEditTime: 2026-10-18 16:20:41
 Refer to    : https://github.com/QixuanAI/qxtoolkit
 '''
 import cv2
+import time
+import bisect
+import threading
+import numpy as np
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 try:
     from ._inner import *
 except:
     from _inner import *
 
-__all__=["Graffiti","MotionGraffiti"]
-"""Still on working"""
+__all__=["Graffiti","MotionGraffiti","TextCache","text_cache"]
+
+
+def _blit(img, keep, premul, x, y):
+    """
+    img = img * keep / 255 + premul, with the top-left corner of keep and premul at
+    (x, y) of img, clipped by img. Both are uint8 and premul is the colour
+    multiplied by its weight, so it costs 2 vectorized passes over the pixels.
+    """
+    h, w = keep.shape[:2]
+    x0, y0 = max(x, 0), max(y, 0)
+    x1, y1 = min(x + w, img.shape[1]), min(y + h, img.shape[0])
+    if x0 >= x1 or y0 >= y1:
+        return img
+    roi = img[y0:y1, x0:x1]
+    src = np.s_[y0 - y:y1 - y, x0 - x:x1 - x]
+    cv2.add(cv2.multiply(roi, keep[src], scale=1 / 255.), premul[src], dst=roi)
+    return img
+
+
+def _palette(color, channels):
+    """A lookup table of cv2.LUT to paint a uint8 mask in `color` for images of `channels`."""
+    color = (list(color) if np.ndim(color) else [color]) + [0] * 4  # like cv2.Scalar
+    palette = np.arange(256)[:, None] * (np.array(color[:channels], np.float32) / 255)
+    return np.rint(palette).astype(np.uint8).reshape(256, 1, channels)
+
+
+def _paint(mask, palette):
+    """(keep, premul) to blit a uint8 mask in the colour of a palette of _palette()."""
+    keep = cv2.bitwise_not(mask)
+    if palette.shape[2] > 1:
+        keep = cv2.merge([keep] * palette.shape[2])
+        mask = cv2.merge([mask] * palette.shape[2])
+    return keep, cv2.LUT(mask, palette)
+
+
+DESCENDERS = "gjpqy|()[]{}@$,;_"  # the deepest glyphs below the baseline
+
+
+class _Line:
+    """
+    A line of text drawn at one place from painted glyphs, where a new text only pastes
+    the glyphs changed since the last one, if the others keep their places.
+    Pasting takes the min of keep and the max of premul, the same as painting the max
+    of the masks, for glyphs overlap their neighbours by the padding.
+    """
+
+    def __init__(self, cache, style, color, channels):
+        self.cache = cache
+        self.style = style  # (fontFace, fontScale, thickness, lineType)
+        self.palette = _palette(color, channels)
+        self.text = None
+        self._glyphs = {}  # char: (keep, premul, advance)
+        self._widest = 0
+
+    def _glyph(self, char):
+        glyph = self._glyphs.get(char)
+        if glyph is None:
+            mask = self.cache.glyph(char, *self.style)[0]
+            glyph = self._glyphs[char] = _paint(mask, self.palette) + (
+                self.cache.advance(char, *self.style[:3]),)
+            self._widest = max(self._widest, mask.shape[1])
+        return glyph
+
+    def _paste(self, lo, hi):
+        """Paste glyphs over columns [lo, hi)."""
+        keep, premul = self.keep[:, lo:hi], self.premul[:, lo:hi]
+        keep[...] = 255
+        premul[...] = 0
+        for i in range(bisect.bisect_right(self.xs, lo - self._widest), bisect.bisect_left(self.xs, hi)):
+            x, (k, p, _) = self.xs[i], self.glyphs[i]
+            x0, x1 = max(lo, x), min(hi, x + k.shape[1])
+            if x0 < x1:
+                np.minimum(keep[:, x0 - lo:x1 - lo], k[:, x0 - x:x1 - x], out=keep[:, x0 - lo:x1 - lo])
+                np.maximum(premul[:, x0 - lo:x1 - lo], p[:, x0 - x:x1 - x], out=premul[:, x0 - lo:x1 - lo])
+
+    def update(self, text):
+        old = self.text
+        if text == old:
+            return self
+        self.text = text
+        if old is not None and len(old) == len(text):
+            changed = [i for i, (a, b) in enumerate(zip(old, text)) if a != b]
+            news = [self._glyph(text[i]) for i in changed]
+            if all(g[2] == self.glyphs[i][2] for i, g in zip(changed, news)):  # same places
+                lo = hi = None  # columns of changed glyphs, next ones pasted together
+                for i, g in zip(changed, news):
+                    x0 = self.xs[i]
+                    x1 = x0 + max(self.glyphs[i][0].shape[1], g[0].shape[1])
+                    self.glyphs[i] = g
+                    if hi is not None and x0 > hi:
+                        self._paste(lo, hi)
+                        lo = None
+                    lo, hi = x0 if lo is None else lo, x1
+                self._paste(lo, hi)
+                return self
+        self.glyphs = [self._glyph(c) for c in text]
+        self.xs, x = [], 0.
+        for *_, advance in self.glyphs:
+            self.xs.append(int(round(x)))
+            x += advance
+        space, self.x, self.y = self.cache.glyph(" ", *self.style)
+        width = max([x + g[0].shape[1] for x, g in zip(self.xs, self.glyphs)], default=1)
+        self.keep, self.premul = _paint(np.zeros((space.shape[0], width), np.uint8), self.palette)
+        self._paste(0, width)
+        return self
+
+
+class TextCache:
+    """
+    Text rasterized once into a mask, then drawn by a blit of 2 vectorized passes over
+    its box, instead of cv2.putText drawing every stroke again each time.
+    Masks of whole strings suit fixed text, e.g. captions and splashes, which draw 2~3
+    times faster than by cv2.putText. Text changing at the same org, e.g. timestamps
+    and counters, is better drawn by putText(..., atlas=True), which keeps masks of
+    glyphs and re-pastes the changed ones only, rather than filling the cache with
+    strings seen once. That pays off when a few glyphs change per frame, e.g. a time in
+    seconds, while text mostly changing every frame, e.g. microseconds, is cheaper to
+    draw by cv2.putText at small scales.
+    Entries, keyed by text, font, scale, thickness, line type, and colour for painted
+    ones, are evicted least recently used beyond `maxsize`. It is safe to share between
+    threads, at the cost of drawing one text at a time.
+    See `python Example/benchmark.py text`.
+    """
+
+    def __init__(self, maxsize=512):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _get(self, key, make):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                entry = self._entries[key] = make()
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+            return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def getTextSize(self, text, fontFace=cv2.FONT_HERSHEY_DUPLEX, fontScale=1., thickness=1):
+        """Like cv2.getTextSize, return ((width, height), baseline)."""
+        return self._get(("size", text, fontFace, fontScale, thickness),
+                         lambda: cv2.getTextSize(text, fontFace, fontScale, thickness))
+
+    def advance(self, char, fontFace=cv2.FONT_HERSHEY_DUPLEX, fontScale=1., thickness=1):
+        """Pixels from a glyph to the next one, not rounded."""
+        return self._get(("advance", char, fontFace, fontScale, thickness), lambda: (
+            self.getTextSize(char * 11, fontFace, fontScale, thickness)[0][0] -
+            self.getTextSize(char, fontFace, fontScale, thickness)[0][0]) / 10.)
+
+    def mask(self, text, fontFace=cv2.FONT_HERSHEY_DUPLEX, fontScale=1., thickness=1,
+             lineType=cv2.LINE_AA):
+        """
+        Return (mask, x, y), the uint8 mask of text drawn at (x, y) like cv2.putText.
+        """
+        def make():
+            (tw, th), base = self.getTextSize(text, fontFace, fontScale, thickness)
+            return self._render(text, tw, th, base, fontFace, fontScale, thickness, lineType)
+        return self._get(("mask", text, fontFace, fontScale, thickness, lineType), make)
+
+    def glyph(self, char, fontFace=cv2.FONT_HERSHEY_DUPLEX, fontScale=1., thickness=1,
+              lineType=cv2.LINE_AA):
+        """Like mask(), but all glyphs of a font have the same height and y, to make lines."""
+        def make():
+            (tw, th), _ = self.getTextSize(char, fontFace, fontScale, thickness)
+            base = self.getTextSize(DESCENDERS, fontFace, fontScale, thickness)[1]
+            return self._render(char, tw, th, base, fontFace, fontScale, thickness, lineType)
+        return self._get(("glyph", char, fontFace, fontScale, thickness, lineType), make)
+
+    @staticmethod
+    def _render(text, tw, th, base, fontFace, fontScale, thickness, lineType):
+        pad = thickness + 1
+        mask = np.zeros((th + base + 2 * pad, tw + 2 * pad), np.uint8)
+        cv2.putText(mask, text, (pad, pad + th), fontFace, fontScale, 255, thickness, lineType)
+        return mask, pad, pad + th
+
+    def putText(self, img, text, org, fontFace=cv2.FONT_HERSHEY_DUPLEX, fontScale=1.,
+                color=(0, 0, 255), thickness=1, lineType=cv2.LINE_8, bottomLeftOrigin=False,
+                atlas=False):
+        """
+        Like cv2.putText, draw text on img in place and return img.
+        Args:
+            @atlas: draw it from glyphs, for text changing at the same org.
+        Images other than uint8, or bottomLeftOrigin, fall back to cv2.putText.
+        """
+        if img.dtype != np.uint8 or bottomLeftOrigin:
+            return cv2.putText(img, text, org, fontFace, fontScale, color, thickness,
+                               lineType, bottomLeftOrigin)
+        channels = 1 if img.ndim == 2 else img.shape[2]
+        color = tuple(color) if np.ndim(color) else color
+        style = (fontFace, fontScale, thickness, lineType)
+        with self._lock:
+            if atlas:
+                entry = self._get(("line", tuple(org)) + style + (color, channels),
+                                  lambda: _Line(self, style, color, channels)).update(text)
+                keep, premul, x, y = entry.keep, entry.premul, entry.x, entry.y
+            else:
+                def make():
+                    mask, x, y = self.mask(text, *style)
+                    return _paint(mask, _palette(color, channels)) + (x, y)
+                keep, premul, x, y = self._get(("paint", text) + style + (color, channels), make)
+            return _blit(img, keep, premul, org[0] - x, org[1] - y)
+
+
+text_cache = TextCache()  # shared by default
+
+
+class _Layer:
+    """A drawing shown from `start` for `duration` seconds, rendered once into BGRA pieces."""
+
+    def __init__(self, id, start, duration, render):
+        self.id = id
+        self.start = start
+        self.end = float("inf") if duration is None else start + duration
+        self._render = render
+        self._pieces = None
+
+    @property
+    def pieces(self):
+        """List of (patch, x, y), a BGRA patch with its top-left corner on the canvas."""
+        if self._pieces is None:
+            self._pieces = self._render()
+        return self._pieces
+
+
+def _area(r):
+    return (r[2] - r[0]) * (r[3] - r[1])
+
+
+def _group_pieces(pieces, w, h, overhead=400):
+    """
+    Group pieces (patch, x, y) into rects (x0, y0, x1, y1) to blend one by one.
+    A piece joins the only group it overlaps if that blends at most `overhead` more
+    pixels, which cost about as much as one more blend. Otherwise it starts a new
+    group, which is blended after all others, so later layers are always on top.
+    """
+    groups = []  # [rect, pieces]
+    for p, x, y in pieces:
+        r = (max(x, 0), max(y, 0), min(x + p.shape[1], w), min(y + p.shape[0], h))
+        if r[0] >= r[2] or r[1] >= r[3]:
+            continue
+        hits = [g for g in groups if r[0] < g[0][2] and g[0][0] < r[2] and
+                r[1] < g[0][3] and g[0][1] < r[3]]
+        if len(hits) == 1:
+            g = hits[0]
+            union = (min(r[0], g[0][0]), min(r[1], g[0][1]), max(r[2], g[0][2]), max(r[3], g[0][3]))
+            if _area(union) <= _area(r) + _area(g[0]) + overhead:
+                g[0] = union
+                g[1].append((p, x, y))
+                continue
+        groups.append([r, [(p, x, y)]])
+    return groups
+
+
+class _Composite:
+    """
+    Visible layers flattened into groups of dirty rects of a frame shape. Every rect keeps
+    its colour premultiplied by the weights, so drawing it is one blit per rect, or a
+    copy if it is opaque.
+    """
+
+    def __init__(self, layers, shape, rgb=False):
+        self.shape = shape
+        h, w = shape[:2]
+        pieces = [(p, x, y) for layer in layers for p, x, y in layer.pieces]
+        self.blits = []
+        for (x0, y0, x1, y1), group in _group_pieces(pieces, w, h):
+            color = np.zeros((y1 - y0, x1 - x0, 3), np.float32)
+            weight = np.zeros((y1 - y0, x1 - x0, 1), np.float32)
+            for p, x, y in group:  # later layers on top
+                px0, py0 = max(x, x0), max(y, y0)
+                px1, py1 = min(x + p.shape[1], x1), min(y + p.shape[0], y1)
+                src = p[py0 - y:py1 - y, px0 - x:px1 - x]
+                a = src[..., 3:] / np.float32(255)
+                dst = np.s_[py0 - y0:py1 - y0, px0 - x0:px1 - x0]
+                color[dst] += src[..., :3] * a - color[dst] * a  # premultiplied by weight
+                weight[dst] += (1 - weight[dst]) * a
+            color = np.divide(color, weight, out=np.zeros_like(color), where=weight > 0)
+            color = np.rint(color).astype(np.uint8)
+            if rgb:
+                color = color[..., ::-1].copy()
+            if len(shape) == 2 or shape[2] == 1:
+                color = cv2.cvtColor(color, cv2.COLOR_BGR2GRAY)
+            elif shape[2] == 4:
+                color = cv2.cvtColor(color, cv2.COLOR_BGR2BGRA)
+            weight = weight[..., 0]
+            if not weight.any():
+                continue
+            if weight.min() == 1:  # opaque, a copy is enough
+                self.blits.append((np.s_[y0:y1, x0:x1], color, None))
+            else:
+                if color.ndim == 3:
+                    weight = weight[..., None]
+                keep = np.rint((1 - weight) * 255).astype(np.uint8)
+                keep = np.ascontiguousarray(np.broadcast_to(keep, color.shape))
+                premul = np.rint(color * weight).astype(np.uint8)
+                self.blits.append((np.s_[y0:y1, x0:x1], premul, keep))
+
+    def draw(self, img):
+        for rect, color, keep in self.blits:
+            roi = img[rect]
+            if keep is None:
+                roi[...] = color
+            else:  # as _blit, the rects are inside the frame already
+                cv2.add(cv2.multiply(roi, keep, scale=1 / 255.), color, dst=roi)
+        return img
+
 
 class Graffiti:
+    """
+    Draw captions, sub-images and boxes over frames, each shown from a start time for a
+    duration, e.g.
+        graffiti = Graffiti()
+        graffiti.caption("REC", (20, 40), color=colors.Red.value)
+        graffiti.box((100, 100), (300, 200), start=2, duration=5)
+        for frame in ImagesGetter(0):
+            graffiti(frame)
+    Every layer is rasterized once, and the visible layers are flattened into a cached
+    composite of the dirty rects only, which is rebuilt when layers appear or disappear.
+    So a frame costs a blend of the pixels under the layers, however many of them.
+    Frames are uint8, with 1, 3 or 4 channels.
+    """
 
-    def __init__(self, canvas=None, motiontime=None, colortype=None):
+    def __init__(self, canvas=None, motiontime=None, colortype=None, cache=8):
+        """
+        Args:
+            @canvas: the frame to draw on when draw() is called without one.
+            @motiontime: a function returning the time in seconds, time.monotonic by default.
+                        Used when frames are drawn without a timestamp.
+            @colortype: channel order of frames and sub-images, "BGR" by default or "RGB".
+                        Colors are always given in BGR, like the `colors` enum.
+            @cache: count of composites to keep for layers shown again.
+        """
         self.canvas = canvas
         self.motiontime = motiontime
         self.colortype = colortype
+        self._layers = OrderedDict()
+        self._ids = 0
+        self._cache = OrderedDict()
+        self._cachesize = cache
+        self._origin = None
+        self._elapsed = 0.
 
     @property
     def canvas(self):
@@ -33,6 +386,7 @@ class Graffiti:
 
     @property
     def elapsedtime(self):
+        """Seconds from the first drawn frame to the last one, the time of layers."""
         return self._elapsed
 
     @property
@@ -41,27 +395,238 @@ class Graffiti:
 
     @motiontime.setter
     def motiontime(self, value):
-        self._time=value
+        self._time = time.monotonic if value is None else value
 
     @property
     def colortype(self):
         return self._colortype
 
     @colortype.setter
-    def colortype(self,value):
-        self._colortype=value
+    def colortype(self, value):
+        value = "BGR" if value is None else value.upper()
+        if value not in ("BGR", "RGB"):
+            raise ValueError("colortype must be BGR or RGB, got %s" % value)
+        self._colortype = value
 
-    def caption(self, text, img, elapsed, time):
-        pass
+    def restart(self):
+        """Count the time of layers from the next frame again."""
+        self._origin = None
+        self._elapsed = 0.
 
-    def subimage(self, subimg, img, elapsed, time):
-        pass
+    def _add(self, start, duration, render):
+        self._ids += 1
+        start = self._elapsed if start is None else start
+        self._layers[self._ids] = _Layer(self._ids, start, duration, render)
+        return self._ids
 
+    def caption(self, text, org, start=None, duration=None, fontFace=cv2.FONT_HERSHEY_DUPLEX,
+                fontScale=1., color=(0, 0, 255), thickness=1, bgcolor=None, alpha=1.):
+        """
+        Add a line of text, `org` is its bottom-left corner like cv2.putText.
+        Args:
+            @start: seconds of elapsedtime to show it, None means now.
+            @duration: seconds to show it, None means until removed.
+            @bgcolor: color of a box behind the text, None for transparent.
+            @alpha: opacity of the layer.
+        Return the id of the layer, for remove().
+        """
+        def render():
+            mask, x, y = text_cache.mask(text, fontFace, fontScale, thickness)
+            patch = np.empty(mask.shape + (4,), np.uint8)
+            patch[..., :3] = color
+            if bgcolor is not None:
+                a = mask[..., None] / 255.
+                patch[..., :3] = np.multiply(color, a) + np.multiply(bgcolor, 1 - a)
+                mask = 255
+            patch[..., 3] = np.multiply(mask, alpha)
+            return [(patch, org[0] - x, org[1] - y)]
+        return self._add(start, duration, render)
+
+    def subimage(self, subimg, org, start=None, duration=None, size=None, alpha=1.):
+        """
+        Add an image with its top-left corner at `org`. A 4-channel image is blended by
+        its own alpha channel.
+        Args:
+            @start: seconds of elapsedtime to show it, None means now.
+            @duration: seconds to show it, None means until removed.
+            @size: (width, height) to resize it to, None keeps its size.
+            @alpha: opacity of the layer.
+        Return the id of the layer, for remove().
+        """
+        subimg = subimg.copy()  # the caller may reuse its buffer
+
+        def render():
+            img = subimg if size is None else cv2.resize(subimg, tuple(size))
+            if img.ndim == 2 or img.shape[2] == 1:
+                img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGRA)
+            elif img.shape[2] == 3:
+                img = cv2.cvtColor(img, cv2.COLOR_BGR2BGRA)
+            if self.colortype == "RGB":  # composites are built in BGR
+                img = img[..., [2, 1, 0, 3]]
+            patch = np.ascontiguousarray(img)
+            patch[..., 3] = patch[..., 3] * alpha
+            return [(patch, org[0], org[1])]
+        return self._add(start, duration, render)
+
+    def box(self, pt1, pt2, color=(255, 0, 0), thickness=2, start=None, duration=None, alpha=1.):
+        """
+        Add a rectangle between corners `pt1` and `pt2`, filled if thickness < 0.
+        Args:
+            @start: seconds of elapsedtime to show it, None means now.
+            @duration: seconds to show it, None means until removed.
+            @alpha: opacity of the layer.
+        Return the id of the layer, for remove().
+        """
+        def piece(x0, y0, x1, y1, mask=None):
+            patch = np.empty((y1 - y0, x1 - x0, 4), np.uint8)
+            patch[..., :3] = color
+            if mask is None:
+                patch[..., 3] = 255 * alpha
+            else:
+                np.multiply(mask, alpha, out=patch[..., 3], casting="unsafe")
+            return patch, x0, y0
+
+        def render():
+            x0, x1 = sorted((pt1[0], pt2[0]))
+            y0, y1 = sorted((pt1[1], pt2[1]))
+            if thickness < 0:
+                return [piece(x0, y0, x1 + 1, y1 + 1)]
+            # cv2.rectangle centers thick strokes on the edges and rounds the corners,
+            # so let it stroke the mask, on a margin wider than the stroke.
+            m = thickness
+            mask = np.zeros((y1 - y0 + 1 + 2 * m, x1 - x0 + 1 + 2 * m), np.uint8)
+            cv2.rectangle(mask, (m, m), (x1 - x0 + m, y1 - y0 + m), 255, thickness)
+            r = m - cv2.boundingRect(mask)[0]  # reach of the stroke beyond the edges
+            mask = mask[m - r:mask.shape[0] - m + r, m - r:mask.shape[1] - m + r]
+            outer = (x0 - r, y0 - r, x1 + r + 1, y1 + r + 1)
+            inner = (x0 + r + 1, y0 + r + 1, x1 - r, y1 - r)
+            if inner[0] >= inner[2] or inner[1] >= inner[3] or _area(inner) < 1200:
+                return [piece(*outer, mask)]  # cheaper to blend than 3 more pieces
+            # the 4 edges only, the inside costs nothing to blend
+            a, b = inner[1] - outer[1], inner[3] - outer[1]
+            c, d = inner[0] - outer[0], inner[2] - outer[0]
+            return [piece(outer[0], outer[1], outer[2], inner[1], mask[:a]),
+                    piece(outer[0], inner[3], outer[2], outer[3], mask[b:]),
+                    piece(outer[0], inner[1], inner[0], inner[3], mask[a:b, :c]),
+                    piece(inner[2], inner[1], outer[2], inner[3], mask[a:b, d:])]
+        return self._add(start, duration, render)
+
+    def remove(self, layer):
+        """Remove a layer by its id."""
+        self._layers.pop(layer, None)
+
+    def clear(self):
+        """Remove all layers."""
+        self._layers.clear()
+        self._cache.clear()
+
+    def _visible(self, t):
+        return tuple(l for l in tuple(self._layers.values()) if l.start <= t < l.end)
+
+    def _build(self, key, layers):
+        return _Composite(layers, key[0], self.colortype == "RGB")
+
+    def _composite(self, key, layers):
+        """The composite of `layers`, built now and cached."""
+        composite = self._cache.get(key)
+        if composite is None:
+            composite = self._cache[key] = self._build(key, layers)
+            while len(self._cache) > self._cachesize:
+                self._cache.popitem(last=False)
+        self._cache.move_to_end(key)
+        return composite
+
+    def draw(self, img=None, timestamp=None):
+        """
+        Draw visible layers on `img` in place, or on canvas if img is None.
+        Args:
+            @timestamp: time of the frame in seconds, None asks motiontime.
+        Return the image.
+        """
+        img = self.canvas if img is None else img
+        timestamp = self.motiontime() if timestamp is None else timestamp
+        if self._origin is None:
+            self._origin = timestamp
+        self._elapsed = t = timestamp - self._origin
+        layers = self._visible(t)
+        if not layers:
+            return img
+        composite = self._composite((img.shape, tuple(l.id for l in layers)), layers)
+        return composite.draw(img) if composite is not None else img
+
+    __call__ = draw
+
+    @staticmethod
+    def putText(img, text, org, fontFace=cv2.FONT_HERSHEY_DUPLEX, fontScale=1., color=[0, 0, 255],
+                thickness=1, lineType=8, atlas=False):
+        """Draw text right now like cv2.putText, by the shared text_cache."""
+        return text_cache.putText(img, text, org, fontFace, fontScale, color, thickness,
+                                  lineType, atlas=atlas)
 
-    def putText(img, text, org, fontFace=cv2.FONT_HERSHEY_DUPLEX,fontScale=1.,color=[0,0,255],):
-        img = cv2.putText(img, text, org, fontFace, fontScale, color, thickness=1, lineType=8, bottomLeftOrigin=False)
-        return img
 
 class MotionGraffiti(Graffiti):
-    """Multi-thread motion graffiti"""
-    pass
\ No newline at end of file
+    """
+    Graffiti building composites on a worker thread. The composite of the next
+    change of layers is built ahead, so a frame doesn't wait for rasterizing timed
+    layers. A frame only waits for the build when the layers change in a way not
+    known ahead, like add(), remove() or clear() between frames, since it never
+    gets a composite of other layers.
+    """
+
+    def __init__(self, canvas=None, motiontime=None, colortype=None, cache=8):
+        super().__init__(canvas, motiontime, colortype, cache)
+        self._pool = ThreadPoolExecutor(1, thread_name_prefix="graffiti")
+        self._pending = {}
+        self._ahead = None
+
+    def remove(self, layer):
+        super().remove(layer)
+        for key in [k for k in self._pending if layer in k[1]]:
+            self._pending.pop(key).cancel()
+        self._ahead = None
+
+    def clear(self):
+        super().clear()
+        for future in self._pending.values():
+            future.cancel()
+        self._pending.clear()
+        self._ahead = None
+
+    def _submit(self, key, layers):
+        if key not in self._cache and key not in self._pending:
+            self._pending[key] = self._pool.submit(self._build, key, layers)
+
+    def _store(self, key, composite):
+        self._cache[key] = composite
+        while len(self._cache) > self._cachesize:
+            self._cache.popitem(last=False)
+
+    def _composite(self, key, layers):
+        for k, future in list(self._pending.items()):
+            if future.done():
+                del self._pending[k]
+                self._store(k, future.result())
+        if key not in self._cache:
+            self._submit(key, layers)
+            self._store(key, self._pending.pop(key).result())
+        self._cache.move_to_end(key)
+        return self._cache[key]
+
+    def draw(self, img=None, timestamp=None):
+        img = super().draw(img, timestamp)
+        # build the layers of the next change ahead
+        t = self._elapsed
+        change = min((s for l in tuple(self._layers.values()) for s in (l.start, l.end) if s > t),
+                     default=None)
+        if change is not None and change != self._ahead:
+            self._ahead = change
+            ahead = self._visible(change)
+            if ahead:
+                self._submit((img.shape, tuple(l.id for l in ahead)), ahead)
+        return img
+
+    __call__ = draw
+
+    def close(self):
+        """Stop the worker thread."""
+        self._pool.shutdown(wait=False)
@@ -11,13 +11,28 @@ Refer to    : https://github.com/QixuanAI/qxtoolkit
 import cv2
 import numpy as np
 import os
-import glob
 import re
+import json
+import queue
+import operator
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 try:  # for package import
     from ._inner import *
+    from .preprocess import Preprocess
+    from .framecache import FrameCache
+    from .capture import open_capture, is_capture_uri
+    from .motion import MotionDetector
+    from .graffiti import text_cache
 except:  # for directly running
     from _inner import *
+    from preprocess import Preprocess
+    from framecache import FrameCache
+    from capture import open_capture, is_capture_uri
+    from motion import MotionDetector
+    from graffiti import text_cache
 
 __all__ = ["ImagesGetter"]
 
@@ -27,21 +42,54 @@ class ImagesGetter(object):
     Quickly get seriese of images from either of a camera, a video or a directory of pictures.
     """
 
-    def __init__(self, src, interval=0, scale=1, img_ext='.jpg', cam_warmup=-1, autorelease=True):
+    def __init__(self, src, interval=0, scale=1, img_ext='.jpg', cam_warmup=-1, autorelease=True,
+                 prefetch=0, workers=0, inflight=0, seek_threshold=-1, reuse=0, preprocess=None,
+                 cache_dir=None, cache_limit=16 << 30, sort="natural", recursive=False,
+                 file_index=False, stats=False):
         """
         Args:
             @src: can be a int (for a camera device number),
+                           a capture backend uri like "synthetic:lissajous?fps=120",
                            a path to a video file,
                            or a path to a directory with seriese of images.
             @interval: the interval of frame skip.
-            @scale: a scale factor for output images.
-            @img_ext: a filter to determin what kinds of images can be loaded.
+            @scale: a scale factor for output images, ignored if preprocess is given.
+            @img_ext: a filter to determin what kinds of images can be loaded, case-insensitive.
                         default is '.jpg'. It can alse be a tuple like ('.jpg', '.bmp').
             @cam_warmup: Since some cameras require a warm-up time, we can spend this time
                         by taking some useless photos. This parameter decides how many photos
                         we should take. 0 means None, negative number like -1 means autofit.
                         A proper value is 10 for most cameras.
             @autorelease: Release device or files after get all images.
+            @prefetch: Decode frames on a background thread, keeping at most this many
+                        decoded frames waiting in a queue. 0 means decode on the caller's thread.
+            @workers: Only for a directory of images. Decode images with a pool of this many
+                        threads (cv2.imread releases the GIL), still output in the original order.
+            @inflight: Max count of images being decoded or waiting to be output when workers > 0,
+                        which bounds the memory. 0 means 2*workers.
+            @seek_threshold: Only for a video. Skip at most this many frames by decoding forward
+                        with grab(), and seek when skipping more. Since a seek decodes from the
+                        previous keyframe, a proper value is about twice the GOP size of the video.
+                        Negative number like -1 means autofit.
+            @reuse: If > 0, decode frames into a pool of reusable buffers rather than
+                        allocating a new array per frame. A returned frame will be overwritten
+                        once `reuse` more frames are taken, copy it if you need it longer.
+                        0 means every frame is a new array owned by the caller.
+            @preprocess: a Preprocess to crop, resize, color convert or normalize every frame.
+            @cache_dir: Only for a video. A folder to cache decoded frames in. The first pass
+                        decodes the video and saves raw frames there, later getters of the same
+                        video output read-only views of a memory-mapped file without decoding,
+                        and `frames` gives random access to them.
+            @cache_limit: Max bytes of cache_dir, the least recently used videos are deleted.
+            @sort: Only for a directory of images. The order of images, 'natural' sorts
+                        numbers in names by value (img2 < img10), 'name' sorts by string.
+                        None outputs images in filesystem order, the first image comes out
+                        at once instead of after scanning the whole directory.
+            @recursive: Only for a directory of images. Also load images in sub directories.
+            @file_index: Only for a directory of images. Save the list of images to
+                        `.images.index` in the directory, and reuse it until the directory changes.
+            @stats: Print times of "decode" and "preprocess" when all frames are taken,
+                        like cam_record does for its stages.
             @errlevel: (Todo)Difined the action when meeting problems. Refer to global.py.
         """
         self.src = src
@@ -49,18 +97,39 @@ class ImagesGetter(object):
         self.img_ext = img_ext
         self.cam_warmup = cam_warmup
         self.autorelease = autorelease
+        self.prefetch = prefetch
+        self.workers = workers
+        self.inflight = inflight if inflight > 0 else 2 * workers
+        self.seek_threshold = seek_threshold
+        self.reuse = reuse
         self._out_count = 0
         self._is_end = lambda: True
-        self._adjust = []
         self.scale = scale
-        if abs(scale) > 1:
-            self._adjst.append(lambda img: cv2.resize(
-                img, (0, 0), fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC))
-        elif 0 < abs(scale) < 1:
-            self._adjst.append(lambda img: cv2.resize(
-                img, (0, 0), fx=scale, fy=scale, interpolation=cv2.INTER_AREA))
+        if preprocess is None:
+            preprocess = Preprocess(scale=scale, reuse=reuse)
+        elif scale != 1:
+            report(WARNING, "scale is ignored since preprocess is given.")
+        self.preprocess = preprocess
+        self.cache = FrameCache(cache_dir, cache_limit) if cache_dir is not None else None
+        self.sort = sort
+        self.recursive = recursive
+        self.file_index = file_index
+        self.stats = stats
+        # Times of taking a frame from the source ("decode", only the wait with prefetch
+        # or workers) and of "preprocess", print(getter.chrono) or set stats to see them.
+        self.chrono = chronograph()
         self.reset()
 
+    @property
+    def len(self) -> float:
+        """Count of frames of the source, float('inf') for a camera.
+        For a directory of images, this waits for scanning all of it."""
+        return len(self._images) if self._images is not None else self._len
+
+    @len.setter
+    def len(self, value):
+        self._len = value
+
     @property
     def isAvailable(self) -> bool:
         return not self._is_end()
@@ -98,27 +167,151 @@ class ImagesGetter(object):
 
     def __call__(self) -> np.ndarray:
         while self.isAvailable:
-            img = self._next(self.interval)
-            for adj in self._adjust:
-                img = adj(img)
+            img = self._read()
             self._out_count += 1
             yield img
-        if self.autorelease:
-            self._release()
+        self._end()
 
     def __iter__(self):
         return self
 
     def __next__(self):
         if self.isAvailable:
-            img = self._next(self.interval)
-            for adj in self._adjust:
-                img = adj(img)
+            img = self._read()
             self._out_count += 1
             return img
+        self._end()
+        raise StopIteration
+
+    def _end(self):
+        """Called when all frames are taken."""
         if self.autorelease:
             self._release()
-        raise StopIteration
+        if self.stats and not self._reported:
+            self._reported = True
+            print("ImagesGetter", self.src, "times")
+            for lap in self.chrono.laps.values():
+                print("\t" + str(lap))
+
+    def _read(self, out=None, decode_out=None):
+        """Take the next frame, decoded into `decode_out` and preprocessed into `out` if given."""
+        with self.chrono("decode"):
+            img = self._next(self.interval, decode_out)
+        if img is None:
+            return None
+        with self.chrono("preprocess"):
+            return self.preprocess(img, out)
+
+    def batches(self, batch_size: int, ring=0, drop_last=False):
+        """Yield frames stacked in contiguous arrays shaped (B, H, W, C).
+        Frames are written straight into a preallocated batch, so no np.stack is needed.
+        Args:
+            @batch_size: count of frames per batch, the last batch may be shorter.
+            @ring: If > 0, cycle through this many preallocated batch buffers, so the
+                        steady state allocates nothing. A yielded batch stays valid while
+                        the next `ring - 1` batches are yielded, and is overwritten by the
+                        one after, copy it if you need it longer. 0 means a new buffer per batch.
+            @drop_last: Drop the last batch if it is shorter than batch_size.
+        """
+        buffers = []
+        layout = []  # (shape, dtype) of a frame, known after the first one
+        batch, n = None, 0
+
+        def _new_batch(shape, dtype):
+            layout[:] = shape, dtype
+            if len(buffers) < ring or ring <= 0:
+                batch = np.empty((batch_size,) + shape, dtype=dtype)
+            else:  # all allocated, reuse the oldest
+                batch = buffers.pop(0)
+            if ring > 0:
+                buffers.append(batch)
+            return batch
+
+        while self.isAvailable:
+            if batch is None and layout:
+                batch = _new_batch(*layout)
+            out = batch[n] if batch is not None else None
+            # Decode straight into the batch when there is nothing to preprocess.
+            img = self._read(out, out if self.preprocess.isIdentity else None)
+            if img is None:
+                break
+            img = img.reshape(img.shape[:2] + (-1,))
+            if batch is None:
+                batch = _new_batch(img.shape, img.dtype)
+            if img.shape != batch.shape[1:]:
+                report(ERROR, "Frame shape changed from {} to {}, can't put it in a batch.".format(
+                    batch.shape[1:], img.shape))
+            if out is None or not np.may_share_memory(img, out):
+                np.copyto(batch[n], img)
+            n += 1
+            self._out_count += 1
+            if n == batch_size:
+                yield batch
+                batch, n = None, 0
+        if n > 0 and not drop_last:
+            yield batch[:n]
+        self._end()
+
+    def moving(self, detector=None):
+        """Yield only frames with motion, skipping still ones.
+        Args:
+            @detector: a MotionDetector, None means one with default settings.
+        """
+        if detector is None:
+            detector = MotionDetector()
+        for img in self:
+            if img is not None and detector(img):  # None for an unreadable or missing frame
+                yield img
+
+    def aiter(self, maxsize=2, executor=None):
+        """Async iterator of frames: `async for img in getter.aiter(): ...`
+        Frames are read in `executor` (a new thread if None) and wait in a queue of at
+        most `maxsize` frames. With reuse, make it larger than maxsize + 1."""
+        return async_frames(self._next_or_end, maxsize, executor)
+
+    def _next_or_end(self):
+        try:
+            return next(self)
+        except StopIteration:  # can't be raised through a future
+            return END_OF_FRAMES
+
+    def __len__(self) -> int:
+        if self._get is None:
+            raise TypeError("A camera has no length.")
+        return int(self.len)
+
+    def __bool__(self):
+        return True
+
+    def __getitem__(self, key):
+        """Random access to frames of a video or a directory of images, by an int,
+        a slice or an array of indices. A slice or an array returns a list of frames.
+        Random access has its own decoder, so it won't move the iteration."""
+        if self._get is None:
+            raise TypeError("Frames of a camera can't be indexed.")
+        if isinstance(key, slice):
+            return self[np.arange(*key.indices(len(self)))]
+        if np.ndim(key) == 0:
+            idx = operator.index(key)
+            if idx < 0:
+                idx += len(self)
+            if not 0 <= idx < len(self):
+                raise IndexError("Frame index {} out of range.".format(key))
+            src = self._get(idx)
+            img = self.preprocess(src)
+            # Outputs of the reuse ring are overwritten by later reads, but frames
+            # of random access are kept by the caller, so each gets its own array.
+            if self.preprocess.reuse > 0 and img is not src:
+                img = img.copy()
+            return img
+        indices = np.asarray(key)
+        if indices.dtype == bool:
+            indices = np.flatnonzero(indices)
+        # Read in ascending order, so the decoder mostly moves forward.
+        frames = [None] * len(indices)
+        for i in np.argsort(indices, kind="stable"):
+            frames[i] = self[int(indices[i])]
+        return frames
 
     def get(self) -> np.ndarray:
         print("[i]Recommoned Usage: directly call this object." +
@@ -126,39 +319,62 @@ class ImagesGetter(object):
         return self()
 
     def reset(self):
+        self._reported = False
+        self.frames = None
+        self._images = None
+        self._get = None  # random access of a frame, by (idx, out=None)
         # camera
-        if isinstance(self.src, int) or re.match("[0-9]+$", self.src) is not None:
+        if isinstance(self.src, int) or re.match("[0-9]+$", self.src) is not None \
+                or is_capture_uri(self.src):
             self.__setup_cam__(self.src, self.cam_warmup)
         elif os.path.isfile(self.src):  # video
-            self.__setup_video__(self.src)
+            cached = self.cache.load(self.src) if self.cache is not None else None
+            if cached is not None:
+                self.__setup_frames__(*cached)
+            else:
+                self.__setup_video__(self.src)
         elif os.path.isdir(self.src):  # images
             self.__setup_images__(self.src, self.img_ext)
+        if self.reuse > 0:
+            # Frames waiting in prefetch queue take buffers too.
+            extra = self.prefetch + 2 if self.prefetch > 0 else 0
+            self.__setup_reuse__(self.reuse + extra)
+        if self.prefetch > 0:
+            self.__setup_prefetch__(self.prefetch)
 
     def __setup_cam__(self, device: int, warmup_num: int):
-        def _next(interval=0):
-            ret, frame = self.cap.read()
+        def _next(interval=0, out=None):
+            # Skipped frames are only grabbed, never decoded.
             for _ in range(interval):
-                ret, frame = self.cap.read()
+                self.cap.grab()
+            ret, frame = self.cap.read(out)
             return frame if ret else None
 
-        def _init_read(interval=0, waitSec=0.5):
+        def _init_read(interval=0, out=None, waitSec=0.5):
             if (datetime.now()-self._init_time).seconds < waitSec:
-                return self.welcome
-            ret, frame = self.cap.read()
-            self._next = _next
+                # A copy, since frames may be reused as buffers to decode into.
+                if out is not None and out.shape == self.welcome.shape:
+                    np.copyto(out, self.welcome)
+                    return out
+                return self.welcome.copy()
+            # Don't rebind self._next here, it may be wrapped by prefetch.
+            warming.clear()
+            ret, frame = self.cap.read(out)
             return frame if ret else None
 
-        self.cap = cv2.VideoCapture(int(device))
+        self.cap = open_capture(device)
         if not self.cap.isOpened():
             report(WARNING, "Can't open camera device " + str(device))
-        self.width = int(self.scale * self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        self.height = int(self.scale * self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        self.welcome = np.zeros((self.height, self.width, 3), dtype=np.uint8)
+        cam_w = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        cam_h = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.width, self.height = self.preprocess.outputSize(cam_w, cam_h)
+        # Preprocessed as a camera frame, so build it in camera size.
+        self.welcome = np.zeros((cam_h, cam_w, 3), dtype=np.uint8)
         text = "Initiling Camera..."
         font = cv2.FONT_HERSHEY_DUPLEX
-        (tw, th), _ = cv2.getTextSize(text, font, 1, 1)
-        org = ((self.width-tw)//2, (self.height+th)//2)
-        self.welcome = cv2.putText(
+        (tw, th), _ = text_cache.getTextSize(text, font, 1, 1)
+        org = ((cam_w-tw)//2, (cam_h+th)//2)
+        self.welcome = text_cache.putText(
             self.welcome, text, org, font, 1, (192, 168, 31), 1)
 
         # If warm_up is set to -1, we will try 1000 times to get a stable stream from camera.
@@ -177,54 +393,426 @@ class ImagesGetter(object):
         self.len = float('inf')
         self._fps = lambda: self.cap.get(cv2.CAP_PROP_FPS)
         self._init_time = datetime.now()
-        self._next = _init_read if warmup_num > 0 else _next
+        warming = [True] if warmup_num > 0 else []
+        self._next = lambda interval=0, out=None: \
+            _init_read(interval, out) if warming else _next(interval, out)
         self._is_end = lambda: False
         self._release = self.cap.release
 
     def __setup_video__(self, file: str):
-        def _next(interval=0):
-            if interval > 0:
+        def _next(interval=0, out=None):
+            if interval > seek_threshold:
                 self.crt_idx += interval
                 self.cap.set(cv2.CAP_PROP_POS_FRAMES, self.crt_idx)
-            ret, frame = self.cap.read()
+            else:
+                # Decoding forward is cheaper than seeking back to a keyframe.
+                for _ in range(interval):
+                    self.cap.grab()
+                self.crt_idx += interval
+            ret, frame = self.cap.read(out)
             self.crt_idx += 1
             return frame if ret else None
+
+        def _next_caching(interval=0, out=None):
+            # Decode every frame, skipped ones included, to fill the cache.
+            for _ in range(interval + 1):
+                ret, frame = self.cap.read(out)
+                if not ret:  # FRAME_COUNT may be more than the real count
+                    self.len = self.crt_idx
+                    writer.commit()
+                    return None
+                writer.write(frame)
+                self.crt_idx += 1
+            if self.crt_idx >= self.len:
+                writer.commit()
+            return frame
+
+        def _release_caching():
+            if self.crt_idx >= self.len:
+                writer.commit()
+            else:  # incomplete
+                writer.abort()
+            _release()
+
+        def _get(idx, out=None):
+            if self._seeker is None:
+                self._seeker = VideoSeeker(file)
+                self.len = self._seeker.count
+            return self._seeker.read(idx, out)
+
+        def _release():
+            if self._seeker is not None:
+                self._seeker.release()
+                self._seeker = None
+            self.cap.release()
+
         self.cap = cv2.VideoCapture(file)
         if not self.cap.isOpened():
             report(WARNING, "Can't open video file " + str(file))
-        self.width = int(self.scale * self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        self.height = int(self.scale * self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.width, self.height = self.preprocess.outputSize(
+            int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
         self.crt_idx = 0
         self._fps = lambda: self.cap.get(cv2.CAP_PROP_FPS)
         self.len = self.cap.get(cv2.CAP_PROP_FRAME_COUNT)
+        seek_threshold = self.seek_threshold
+        if seek_threshold < 0:
+            # A seek costs about as much as grabbing 2 GOPs (Example/benchmark.py skip).
+            seek_threshold = 2 * guess_gop_size(self.cap)
+        self._init_time = datetime.now()
+        self._is_end = lambda: self.crt_idx >= self.len
+        self._seeker = None
+        self._get = _get
+        if self.cache is not None and self.cap.isOpened():
+            writer = self.cache.writer(file, self._fps())
+            self._next = _next_caching
+            self._release = _release_caching
+        else:
+            self._next = _next
+            self._release = _release
+
+    def __setup_frames__(self, frames: np.ndarray, fps: float):
+        """Output frames of a video from its FrameCache."""
+        def _next(interval=0, out=None):
+            # A view of the mapping is returned, out is not used to avoid a copy.
+            self.crt_idx += interval
+            if self.crt_idx >= self.len:
+                return None
+            frame = frames[self.crt_idx]
+            self.crt_idx += 1
+            return frame
+        self.frames = frames
+        self._get = lambda idx, out=None: frames[idx]
+        self.width, self.height = self.preprocess.outputSize(frames.shape[2], frames.shape[1])
+        self.crt_idx = 0
+        self.len = len(frames)
+        self._fps = lambda: fps
         self._init_time = datetime.now()
         self._next = _next
         self._is_end = lambda: self.crt_idx >= self.len
-        self._release = lambda: self.cap.release
+        self._release = lambda: None
 
     def __setup_images__(self, dir: str, img_ext):
-        def _next(interval=0):
+        def _next(interval=0, out=None):
+            if interval > 0:
+                self.crt_idx += interval
+            if not imgs.has(self.crt_idx):
+                return None
+            img = imread(imgs[self.crt_idx], out)
+            self.crt_idx += 1
+            return img
+
+        def _next_pooled(interval=0, out=None):
             if interval > 0:
                 self.crt_idx += interval
-            img = cv2.imread(imgs[self.crt_idx])
+            # Drop what is no longer wanted, e.g. after interval changed.
+            while loading and loading[0][0] != self.crt_idx:
+                loading.popleft()[1].cancel()
+            idx = loading[-1][0] + interval + 1 if loading else self.crt_idx
+            while len(loading) < self.inflight and imgs.has(idx):
+                loading.append((idx, pool.submit(cv2.imread, imgs[idx])))
+                idx += interval + 1
+            if not loading:
+                return None
+            img = loading.popleft()[1].result()
             self.crt_idx += 1
             return img
-        imgs = []
-        if isinstance(img_ext, str):
-            imgs = glob.glob(os.path.join(dir, '*'+img_ext))
-        elif type(img_ext) in [tuple, list]:
-            for ext in img_ext:
-                imgs.extend(glob.glob(os.path.join(dir, '*'+ext)))
-        if len(imgs) == 0:
+
+        def _release():
+            for _, future in loading:
+                future.cancel()
+            loading.clear()
+            pool.shutdown(wait=False)
+
+        imgs = ImageList(dir, img_ext, self.recursive, self.sort, self.file_index)
+        if not imgs.has(0):
             report(WARNING, "Can't find any images in " + str(dir))
         self.width, self.height = None, None
         self.crt_idx = 0
-        self.len = len(imgs)
+        self._images = imgs
         self._fps = lambda: -1.
         self._init_time = datetime.now()
+        self._is_end = lambda: not imgs.has(self.crt_idx)
+        self._get = lambda idx, out=None: imread(imgs[idx], out)
+        if self.workers > 0:
+            pool = ThreadPoolExecutor(self.workers, thread_name_prefix="ImagesGetter-imread")
+            loading = deque()   # (index, future) in output order
+            self._next = _next_pooled
+            self._release = _release
+        else:
+            self._next = _next
+            self._release = lambda: None
+
+    def __setup_reuse__(self, size: int):
+        """Make the source decode into a ring of `size` buffers."""
+        src_next = self._next
+        pool = deque([None] * size)  # filled with the frames decoded in the first round
+
+        def _next(interval=0, out=None):
+            if out is not None:
+                return src_next(interval, out)
+            frame = src_next(interval, pool[0])
+            pool.rotate(-1)
+            if frame is not None:
+                pool[-1] = frame
+            return frame
+
         self._next = _next
-        self._is_end = lambda: self.crt_idx >= self.len
-        self._release = lambda: None
+
+    def __setup_prefetch__(self, size: int):
+        """Move the source's `_next` to a producer thread feeding a bounded queue."""
+        src_next, src_is_end, src_release = self._next, self._is_end, self._release
+        frames = queue.Queue(maxsize=size)
+        stop = threading.Event()
+        end = object()  # sentinel put after the last frame
+        pending = []    # the frame peeked by _is_end, waiting for _next
+
+        def _put(item):
+            while not stop.is_set():
+                try:
+                    frames.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def _produce():
+            try:
+                while not stop.is_set() and not src_is_end():
+                    if not _put(src_next(self.interval)):
+                        return
+            except Exception as e:
+                report(WARNING, "Prefetch thread stopped by: " + repr(e))
+            _put(end)
+
+        def _is_end():
+            if not pending:
+                if stop.is_set() and frames.empty():
+                    return True
+                pending.append(frames.get())
+            return pending[0] is end
+
+        def _next(interval=0, out=None):
+            # interval was already applied by the producer, out is not used
+            # since the frame was decoded before we knew it.
+            if _is_end():
+                return None
+            return pending.pop()
+
+        def _release():
+            stop.set()
+            worker.join()
+            while not frames.empty():
+                frames.get_nowait()
+            pending[:] = [end]
+            src_release()
+
+        worker = threading.Thread(target=_produce, name="ImagesGetter-prefetch", daemon=True)
+        worker.start()
+        self._next = _next
+        self._is_end = _is_end
+        self._release = _release
+
+
+def natural_key(path: str):
+    """Sort key of a path, which compares numbers by value, like 'img2' < 'img10'."""
+    return [[int(t) if t.isdigit() else t.lower() for t in re.split(r"(\d+)", part)]
+            for part in path.split(os.sep)]
+
+
+def scan_images(dir: str, img_ext, recursive=False):
+    """Yield relative paths of images in `dir` as they are found, in filesystem order.
+    Also yield ('dir', relpath, mtime_ns) for every scanned directory before its images."""
+    exts = tuple(e.lower() for e in ((img_ext,) if isinstance(img_ext, str) else img_ext))
+    folders = [""]
+    while folders:
+        rel = folders.pop()
+        try:
+            with os.scandir(os.path.join(dir, rel)) as entries:
+                yield "dir", rel, os.stat(os.path.join(dir, rel)).st_mtime_ns
+                for entry in entries:
+                    if entry.is_file() and entry.name.lower().endswith(exts):
+                        yield os.path.join(rel, entry.name)
+                    elif recursive and entry.is_dir(follow_symlinks=False):
+                        folders.append(os.path.join(rel, entry.name))
+        except OSError as e:
+            report(WARNING, "Can't scan {}: {}".format(os.path.join(dir, rel), e))
+
+
+class ImageList:
+    """
+    Paths of images in a directory, scanned as they are needed when not sorted.
+    With `file_index`, the list is saved as `.images.index` in the directory, and
+    reused until the directory or any of its scanned sub directories changes.
+    """
+    INDEX_NAME = ".images.index"
+
+    def __init__(self, dir: str, img_ext, recursive=False, sort="natural", file_index=False):
+        if sort not in ("natural", "name", None):
+            report(ERROR, "Unknown sort: " + str(sort))
+        self.dir = dir
+        self._head = {"img_ext": sorted(e.lower() for e in ((img_ext,) if isinstance(img_ext, str) else img_ext)),
+                      "recursive": recursive, "sort": sort}
+        self._index = os.path.join(dir, self.INDEX_NAME) if file_index else None
+        self._dirs = {}     # mtime of scanned directories, to check the index
+        self._paths = self._load_index() if self._index else None
+        if self._paths is not None:
+            self._scan = iter(())
+        elif sort is None:
+            self._paths = []
+            self._scan = scan_images(dir, img_ext, recursive)
+        else:
+            self._paths = []
+            self._scan = scan_images(dir, img_ext, recursive)
+            self._fill(float("inf"))
+            self._paths.sort(key=natural_key if sort == "natural" else None)
+            self._save_index()
+
+    def _fill(self, count):
+        """Scan until there are `count` paths or no more images."""
+        while self._scan is not None and len(self._paths) < count:
+            item = next(self._scan, None)
+            if item is None:
+                self._scan = None
+                if self._head["sort"] is None:
+                    self._save_index()
+            elif isinstance(item, tuple):
+                self._dirs[item[1]] = item[2]
+            else:
+                self._paths.append(item)
+
+    def has(self, idx: int) -> bool:
+        self._fill(idx + 1)
+        return 0 <= idx < len(self._paths)
+
+    def __getitem__(self, idx: int) -> str:
+        self._fill(idx + 1 if idx >= 0 else float("inf"))
+        return os.path.join(self.dir, self._paths[idx])
+
+    def __len__(self):
+        self._fill(float("inf"))
+        return len(self._paths)
+
+    def _save_index(self):
+        if self._index is None:
+            return
+        try:
+            # Creating the file changes mtime of the directory, so do it before taking mtime.
+            open(self._index, "a").close()
+            self._dirs[""] = os.stat(self.dir).st_mtime_ns
+            with open(self._index, "w") as f:
+                f.write(json.dumps(dict(self._head, dirs=self._dirs)) + "\n")
+                f.write("\n".join(self._paths))
+        except OSError as e:
+            report(WARNING, "Can't save image list: " + str(e))
+
+    def _load_index(self):
+        try:
+            with open(self._index) as f:
+                head = json.loads(f.readline())
+                dirs = head.pop("dirs")
+                if head != self._head or any(
+                        os.stat(os.path.join(self.dir, d)).st_mtime_ns != t for d, t in dirs.items()):
+                    return None
+                self._dirs = dirs
+                paths = f.read()
+                return paths.split("\n") if paths else []
+        except (OSError, ValueError, KeyError):
+            return None
+
+
+# OpenCV 4.10+ can decode an image into a given array.
+_IMREAD_DST = "dst" in (cv2.imread.__doc__ or "")
+
+
+def imread(path, out=None):
+    """cv2.imread, reusing the memory of `out` if possible."""
+    if out is None:
+        return cv2.imread(path)
+    if _IMREAD_DST:
+        return cv2.imread(path, out)
+    img = cv2.imread(path)
+    if img is not None and img.shape == out.shape and img.dtype == out.dtype:
+        np.copyto(out, img)
+        return out
+    return img
+
+
+def guess_gop_size(cap) -> int:
+    """Guess the GOP size of an opened video, since OpenCV can't report it.
+    Most encoders put a keyframe every 10~12 frames (MPEG-4 part 2) or every 1~10 seconds (H.264/HEVC)."""
+    fourcc = int(cap.get(cv2.CAP_PROP_FOURCC))
+    codec = "".join(chr((fourcc >> 8 * i) & 0xFF) for i in range(4)).lower()
+    if codec in ("mjpg", "hfyu", "ffv1", "png ", "raw "):  # intra-only
+        return 0
+    if codec in ("h264", "avc1", "x264", "hevc", "h265", "hvc1", "hev1", "vp80", "vp90", "av01"):
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        return max(int(fps), 12) if fps > 0 else 30
+    return 12
+
+
+def keyframe_index(file: str):
+    """Return (keyframes, count) of a video, keyframes is an array of frame indices.
+    Packets are scanned without decoding, and the result is saved next to the video
+    as `<file>.keyframes`, which is reused until the video changes."""
+    index_file = file + ".keyframes"
+    stat = os.stat(file)
+    try:
+        with open(index_file) as f:
+            info = json.load(f)
+        if info["size"] == stat.st_size and info["mtime"] == stat.st_mtime_ns:
+            return np.array(info["keyframes"]), info["count"]
+    except (OSError, ValueError, KeyError):
+        pass
+    keyframes, count = [], 0
+    HAS_KEY_FRAME = getattr(cv2, "CAP_PROP_LRF_HAS_KEY_FRAME", None)
+    if HAS_KEY_FRAME is not None:
+        cap = cv2.VideoCapture(file, cv2.CAP_FFMPEG)
+        if cap.isOpened() and cap.set(cv2.CAP_PROP_FORMAT, -1):  # read raw packets
+            while cap.grab():
+                if cap.get(HAS_KEY_FRAME):
+                    keyframes.append(count)
+                count += 1
+        cap.release()
+    if not keyframes:  # The backend can't tell, guess them and don't save.
+        cap = cv2.VideoCapture(file)
+        count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        keyframes = list(range(0, max(count, 1), max(guess_gop_size(cap), 1)))
+        cap.release()
+        return np.array(keyframes), count
+    try:
+        with open(index_file, "w") as f:
+            json.dump({"size": stat.st_size, "mtime": stat.st_mtime_ns,
+                       "count": count, "keyframes": keyframes}, f)
+    except OSError:  # read-only folder, keep it in memory only
+        pass
+    return np.array(keyframes), count
+
+
+class VideoSeeker:
+    """Random access to frames of a video. It decodes forward from the current position,
+    or seeks when decoding from the nearest keyframe is cheaper."""
+
+    def __init__(self, file: str):
+        self.keyframes, self.count = keyframe_index(file)
+        gaps = np.diff(self.keyframes)
+        self.gop = int(np.median(gaps)) if len(gaps) else max(self.count, 1)
+        self.cap = cv2.VideoCapture(file)
+        self.pos = 0    # index of the frame the decoder reads next
+
+    def read(self, idx: int, out=None):
+        key = self.keyframes[np.searchsorted(self.keyframes, idx, "right") - 1]
+        # Decoding forward costs idx-pos, a seek costs idx-key plus an overhead about a GOP.
+        if not key - self.gop <= self.pos <= idx:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
+            self.pos = idx
+        for _ in range(idx - self.pos):
+            self.cap.grab()
+        ret, frame = self.cap.read(out)
+        self.pos = idx + 1
+        return frame if ret else None
+
+    def release(self):
+        self.cap.release()
 
 
 def run(src=None):
@@ -0,0 +1,115 @@
+#! /usr/bin/env python
+'''
+Description : A cheap motion detector on downscaled grayscale frames.
+FilePath    : /qxtoolkit/qxtoolkit/motion.py
+Author      : qxsoftware@163.com
+Date        : 2026-10-18 13:05:12
+LastEditTime: 2026-10-18 13:05:12
+Refer to    : https://github.com/QixuanAI/qxtoolkit
+'''
+
+import cv2
+import numpy as np
+
+__all__ = ["MotionDetector"]
+
+
+class MotionDetector:
+    """
+    Compare every frame with a running average of the previous ones, on a small
+    grayscale copy of it. A frame has motion if more than `area` of the watched
+    pixels changed by more than `threshold` gray levels.
+    Frames are sampled by nearest neighbour, so a 1080p frame costs well under 1 ms,
+    see `python Example/benchmark.py motion`.
+    Buffers are allocated for the first frame, and again only if the frame shape changes.
+    Call it like `detector(frame)`, it returns True on motion, which also makes it
+    the detector of a cam_record.TriggeredWriter.
+    """
+
+    def __init__(self, width=240, threshold=20, area=0.005, alpha=0.1, roi=None, blur=3):
+        """
+        Args:
+            @width: width of the downscaled frame, the height keeps the aspect ratio.
+            @threshold: change of gray level for a pixel to be moving.
+            @area: fraction of watched pixels moving for a frame to have motion.
+            @alpha: weight of a new frame in the background average. 1 compares
+                        with the previous frame, i.e. plain frame differencing.
+            @roi: pixels to watch, a mask of any size where nonzero is watched, or
+                        a list of rects (x, y, width, height) in frame pixels.
+                        None watches the whole frame.
+            @blur: size of a box filter on the downscaled frame against noise, 0 for none.
+        """
+        self.width = width
+        self.threshold = threshold
+        self.area = area
+        self.alpha = alpha
+        self.roi = roi
+        self.blur = blur
+        self.score = 0.     # fraction of watched pixels moving in the last frame
+        self.moving = None  # mask of moving pixels of the last frame, in the small size
+        self._shape = None
+
+    def __call__(self, frame: np.ndarray, timestamp=None) -> bool:
+        if frame is None:  # a missing frame has no motion, and keeps the background
+            return False
+        if frame.shape != self._shape:
+            self._compile(frame)
+            cv2.resize(frame, self._dsize, dst=self._small, interpolation=cv2.INTER_NEAREST)
+            self._gray_of(self._small)
+            self._background[...] = self._gray
+            return False
+        cv2.resize(frame, self._dsize, dst=self._small, interpolation=cv2.INTER_NEAREST)
+        gray = self._gray_of(self._small)
+        diff = self._diff
+        np.subtract(gray, self._background, out=diff)
+        # background += alpha * (gray - background)
+        np.multiply(diff, self.alpha, out=self._step)
+        np.add(self._background, self._step, out=self._background)
+        np.abs(diff, out=diff)
+        np.greater(diff, self.threshold, out=self.moving)
+        if self._roi is not None:
+            np.logical_and(self.moving, self._roi, out=self.moving)
+        self.score = np.count_nonzero(self.moving) / self._watched
+        return self.score > self.area
+
+    def reset(self):
+        """Forget the background, the next frame becomes the new one."""
+        self._shape = None
+        self.score = 0.
+
+    def _gray_of(self, small):
+        if small.ndim == 3 and small.shape[2] > 1:
+            code = cv2.COLOR_BGR2GRAY if small.shape[2] == 3 else cv2.COLOR_BGRA2GRAY
+            cv2.cvtColor(small, code, dst=self._gray)
+        else:
+            self._gray[...] = small.reshape(self._gray.shape)
+        if self.blur > 1:
+            cv2.blur(self._gray, (self.blur, self.blur), dst=self._gray)
+        return self._gray
+
+    def _compile(self, frame):
+        self._shape = frame.shape
+        h, w = frame.shape[:2]
+        width = min(self.width, w)
+        height = max(1, int(round(h * width / w)))
+        self._dsize = (width, height)
+        self._small = np.empty((height, width) + frame.shape[2:], frame.dtype)
+        self._gray = np.empty((height, width), frame.dtype)
+        self._background = np.empty((height, width), np.float32)
+        self._diff = np.empty((height, width), np.float32)
+        self._step = np.empty((height, width), np.float32)
+        self.moving = np.empty((height, width), bool)
+        self._roi = None
+        if self.roi is not None:
+            if isinstance(self.roi, np.ndarray):
+                roi = cv2.resize(self.roi.astype(np.uint8), self._dsize,
+                                 interpolation=cv2.INTER_NEAREST) > 0
+            else:
+                roi = np.zeros((height, width), bool)
+                sx, sy = width / w, height / h
+                for x, y, rw, rh in self.roi:
+                    roi[int(y * sy):int(np.ceil((y + rh) * sy)),
+                        int(x * sx):int(np.ceil((x + rw) * sx))] = True
+            self._roi = roi
+        self._watched = max(1, np.count_nonzero(self._roi) if self._roi is not None
+                            else width * height)
@@ -0,0 +1,141 @@
+#! /usr/bin/env python
+'''
+Description : A compiled chain of crop, resize, color convert and normalize for frames.
+FilePath    : /qxtoolkit/qxtoolkit/preprocess.py
+Author      : qxsoftware@163.com
+Date        : 2026-10-18 10:02:13
+LastEditTime: 2026-10-18 10:02:13
+Refer to    : https://github.com/QixuanAI/qxtoolkit
+'''
+
+import cv2
+import numpy as np
+from collections import deque
+
+__all__ = ["Preprocess"]
+
+
+class Preprocess:
+    """
+    Crop -> resize -> color convert -> normalize, in this order.
+    The geometry and the intermediate buffers are computed once for the first frame,
+    and only recomputed if the shape of input frames changes.
+    """
+
+    def __init__(self, scale=1, size=None, crop=None, color=None, normalize=False,
+                 mean=0., std=1., interpolation=None, reuse=0):
+        """
+        Args:
+            @scale: a scale factor for output images, ignored if size is given.
+            @size: output size as (width, height).
+            @crop: a rect (x, y, width, height) to crop from the input frame before resizing.
+            @color: a cv2.COLOR_* code, like cv2.COLOR_BGR2RGB.
+            @normalize: output float32 as (img / 255 - mean) / std.
+            @mean, @std: a number or a value per channel, only used when normalize is True.
+            @interpolation: a cv2.INTER_* flag. None means INTER_AREA for shrinking
+                        and INTER_CUBIC for enlarging.
+            @reuse: If > 0, write outputs into a ring of this many buffers, an output will
+                        be overwritten after `reuse` more calls. 0 means a new array per call.
+        """
+        self.scale = abs(scale) if scale else 1
+        self.size = tuple(size) if size is not None else None
+        self.crop = tuple(crop) if crop is not None else None
+        self.color = color
+        self.normalize = normalize
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.std = np.asarray(std, dtype=np.float32)
+        self.interpolation = interpolation
+        self.reuse = reuse
+        self._shape, self._dtype = None, None  # input of the compiled chain
+        self._ops = []
+        self._scratch = []
+        self._outs = deque()
+
+    @property
+    def isIdentity(self) -> bool:
+        """True if frames are returned untouched."""
+        return (self.crop is None and self.size is None and self.scale == 1
+                and self.color is None and not self.normalize)
+
+    def outputSize(self, width, height):
+        """Return the (width, height) of outputs for inputs of the given size."""
+        if self.crop is not None:
+            width, height = self.crop[2:]
+        if self.size is not None:
+            return self.size
+        return int(round(width * self.scale)), int(round(height * self.scale))
+
+    def __call__(self, img: np.ndarray, out=None) -> np.ndarray:
+        """Process a frame, writing the result into `out` if given."""
+        if img is None:
+            return None
+        if self.isIdentity:
+            if out is None or np.may_share_memory(img, out):
+                return img
+            np.copyto(out.reshape(img.shape), img)
+            return out
+        if img.shape != self._shape or img.dtype != self._dtype:
+            self._compile(img)
+        if self.crop is not None:
+            x, y, w, h = self.crop
+            img = img[y:y+h, x:x+w]
+        if out is None:
+            out = self._take()
+        last = len(self._ops) - 1
+        for i, op in enumerate(self._ops):
+            img = op(img, out.reshape(self._outShape) if i == last else self._scratch[i])
+        return out if np.may_share_memory(img, out) else img
+
+    def _take(self):
+        if self.reuse <= 0:
+            return np.empty(self._outShape, self._outDtype)
+        if len(self._outs) < self.reuse:
+            self._outs.append(np.empty(self._outShape, self._outDtype))
+        else:
+            self._outs.rotate(-1)
+        return self._outs[-1]
+
+    def _compile(self, img):
+        """Build the op chain for frames like `img`, and allocate its buffers once."""
+        self._shape, self._dtype = img.shape, img.dtype
+        if self.crop is not None:
+            x, y, w, h = self.crop
+            img = img[y:y+h, x:x+w]
+        ops = []
+        h, w = img.shape[:2]
+        dsize = self.outputSize(w, h)
+        if dsize != (w, h):
+            interp = self.interpolation
+            if interp is None:
+                interp = cv2.INTER_AREA if dsize[0] * dsize[1] < w * h else cv2.INTER_CUBIC
+            ops.append(lambda src, dst: cv2.resize(src, dsize, dst=dst, interpolation=interp))
+        if self.color is not None:
+            ops.append(lambda src, dst: cv2.cvtColor(src, self.color, dst=dst))
+        if self.normalize:
+            # (img / 255 - mean) / std == img * alpha + beta
+            alpha = 1. / (255. * self.std)
+            beta = -self.mean / self.std
+
+            def _normalize(src, dst):
+                if dst is None:
+                    dst = np.empty(src.shape, np.float32)
+                np.multiply(src, alpha, out=dst, casting="unsafe")
+                np.add(dst, beta, out=dst)
+                return dst
+            ops.append(_normalize)
+        if not ops:  # only cropped, make it a contiguous frame
+            def _copy(src, dst):
+                if dst is None:
+                    return src.copy()
+                np.copyto(dst, src)
+                return dst
+            ops.append(_copy)
+        # Run the chain once to learn the shape of every stage.
+        self._scratch = []
+        for op in ops:
+            img = op(img, None)
+            self._scratch.append(img)
+        self._scratch[-1] = None  # the last stage writes into outputs
+        self._ops = ops
+        self._outShape, self._outDtype = img.shape, img.dtype
+        self._outs.clear()
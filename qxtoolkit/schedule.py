@@ -8,23 +8,152 @@ LastEditTime: 2021-02-23 08:47:40
 Refer to    : https://github.com/QixuanAI/qxtoolkit
 '''
 
+import cv2
+import time
+import heapq
+import asyncio
+import itertools
+import threading
+from warnings import warn
 from datetime import datetime, timedelta
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
 
 now = datetime.now
 
-__all__=["schedule"]
+__all__=["schedule", "FrameClock", "Pacer"]
+
+OVERLAP_POLICIES = ("skip", "queue", "concurrent")
+
+
+def _timed(callback, args):
+    """Run a callback in a worker, return (start, end) on time.monotonic."""
+    start = time.monotonic()
+    callback(*args)
+    return start, time.monotonic()
+
+
+async def _timed_async(callback, args):
+    start = time.monotonic()
+    await callback(*args)
+    return start, time.monotonic()
+
+
+class JobStats:
+    """Metrics of the runs of a job dispatched by Call_Me_to_Do, in seconds.
+    latency: from dispatching a run to its start in the pool.
+    runtime: from the start of a run to its end."""
+
+    def __init__(self):
+        self.runs = 0       # runs finished
+        self.skipped = 0    # calls skipped as a previous run was still running
+        self.queued = 0     # calls delayed until a previous run finished
+        self.errors = 0     # runs raised an exception
+        self.latency = 0.   # sum of latency
+        self.maxLatency = 0.
+        self.runtime = 0.   # sum of runtime
+        self.maxRuntime = 0.
+
+    def add(self, latency, runtime):
+        self.runs += 1
+        self.latency += latency
+        self.maxLatency = max(self.maxLatency, latency)
+        self.runtime += runtime
+        self.maxRuntime = max(self.maxRuntime, runtime)
+
+    def __str__(self):
+        n = max(self.runs, 1)
+        return ("{} runs, latency avg {:.2f} ms, max {:.2f} ms, runtime avg {:.2f} ms, max {:.2f} ms,"
+                " skipped {}, queued {}, errors {}").format(
+            self.runs, self.latency / n * 1000, self.maxLatency * 1000, self.runtime / n * 1000,
+            self.maxRuntime * 1000, self.skipped, self.queued, self.errors)
+
+
+class FrameClock:
+    """
+    Clock of a schedule driven by frames rather than wall time: it reads the time of
+    the latest frame since the first one, from timestamps given by
+    schedule.tick(timestamp), or index / fps without them.
+    Jobs can then use frames as a unit of time, e.g. withInterval(30).frames.
+    """
+
+    def __init__(self, fps):
+        self.fps = fps
+        self.index = -1     # index of the latest frame
+        self.time = 0.      # seconds from the first frame to the latest one
+        self._origin = None # timestamp of the first frame
+
+    def __call__(self):
+        return self.time
+
+    def tick(self, timestamp=None):
+        self.index += 1
+        if timestamp is None:
+            self.time = self.index / self.fps
+        else:
+            if self._origin is None:
+                self._origin = timestamp
+            self.time = timestamp - self._origin
+        return self.time
+
+
+class Pacer:
+    """
+    Keep a loop at `fps` by sleeping until the deadline of each iteration, rather than
+    a fixed interval after it, so the time spent in the loop doesn't lower the rate.
+    Deadlines are counted from the first wait(), a late iteration skips the deadlines
+    it missed instead of hurrying to catch up.
+    """
+
+    def __init__(self, fps, clock=time.monotonic, sleep=time.sleep):
+        self.period = 1. / fps
+        self.clock = clock
+        self.sleep = sleep
+        self.late = 0       # iterations which missed their deadline
+        self._next = None
+
+    def wait(self):
+        """Sleep until the next deadline, return the seconds slept, negative if late."""
+        t = self.clock()
+        if self._next is None:
+            self._next = t + self.period
+            return 0.
+        delay = self._next - t
+        if delay > 0:
+            self.sleep(delay)
+            self._next += self.period
+        else:
+            self.late += 1
+            self._next += self.period * (int(-delay // self.period) + 1)
+        return delay
+
+    def reset(self):
+        self._next = None
+
 
 class Job:
 
-    def __init__(self, callback, *args):
+    def __init__(self, callback, *args, clock=time.monotonic):
         self.callback = callback
         self._args = args
+        self._clock = clock
         self._timeval = 0   # a temporary value waiting for time unit
         self._repeat = 0    # repeat times
         self._waittime = timedelta(0)   # wait time up to first callback
-        self._calltime = now()  # time to callback
+        self._start = clock()   # time of the first callback, repeats are timed from it
+        self._slot = 0      # index of the next callback on the grid of intervals
+        self._calltime = self._start    # time to callback
         self._interval = timedelta(0)   # time interval between every repeat
         self._finished = False
+        self._sched = None  # the schedule to notify when the call time changes
+        self._version = 0   # changed with the call time, to tell outdated queue entries
+        self.lateness = 0.  # seconds the last callback was later than its call time
+        self.maxLateness = 0.
+        self.stats = None   # JobStats of a job dispatched to a pool
+        self._overlap = "skip"
+        self._running = 0   # runs dispatched and not finished
+        self._pending = 0   # runs waiting for the previous one with overlap "queue"
+        self._settled = False   # the schedule knows it finished
+        self._lock = threading.Lock()
 
     def after(self, timeval):
         self._timeval = timeval
@@ -42,24 +171,127 @@ class Job:
 
     def withParam(self, *args):
         self._args = args
+        return self
+
+    def overlap(self, policy):
+        """What to do when it's called while the previous run of Call_Me_to_Do hasn't finished:
+        "skip" the call, "queue" it until the previous run finished,
+        or run them "concurrent"ly."""
+        if policy not in OVERLAP_POLICIES:
+            raise ValueError("Overlap policy should be one of " + str(OVERLAP_POLICIES))
+        self._overlap = policy
+        return self
+
+    def update(self, t=None):
+        """Callback if it's time, return True if called."""
+        t = self._clock() if t is None else t
+        if self._finished or t < self._calltime:
+            return False
+        self._fire(t)
+        return True
+
+    def cancel(self):
+        """Stop calling it, runs already dispatched are not interrupted."""
+        if not self._finished:
+            with self._lock:
+                self._pending = 0
+            self._finish()
 
-    def update(self):
-        if now() >= self._calltime:
-            if self._repeat > 0:
-                self._repeat -= 1
-                self._calltime += self._interval
+    def _fire(self, t):
+        self.lateness = t - self._calltime
+        self.maxLateness = max(self.maxLateness, self.lateness)
+        if self._repeat > 0:
+            self._repeat -= 1
+        if self._repeat == 0:
+            self._finished = True
+            self._version += 1
+        else:
+            # Time repeats from the first callback rather than from now, so they don't
+            # drift, and skip the ones already missed.
+            interval = self._interval.total_seconds()
+            self._slot += 1
+            if interval > 0:
+                self._slot = max(self._slot, int((t - self._start) // interval) + 1)
+            self._reschedule(self._start + self._slot * interval)
+        if self.stats is None:
+            self._settle()
             self.callback(*self._args)
-            if self._repeat == 0:
-                self._finished = True
+        else:
+            self._dispatch()
+            self._settle()
+
+    def _dispatch(self):
+        with self._lock:
+            if self._running and self._overlap == "skip":
+                self.stats.skipped += 1
+                return
+            if self._running and self._overlap == "queue":
+                self._pending += 1
+                self.stats.queued += 1
+                return
+            self._running += 1
+        self._submit()
+
+    def _submit(self):
+        submitted = time.monotonic()
+        future = self._sched._submit(self.callback, self._args)
+        future.add_done_callback(lambda f: self._done(f, submitted))
+
+    def _done(self, future, submitted):
+        again = False
+        with self._lock:
+            self._running -= 1
+            if future.exception() is not None:
+                self.stats.errors += 1
+                warn("[!]Job {} raised {!r}".format(
+                    getattr(self.callback, "__name__", self.callback), future.exception()))
+            else:
+                start, end = future.result()
+                self.stats.add(start - submitted, end - start)
+            if self._pending:
+                self._pending -= 1
+                self._running += 1
+                again = True
+        if again:
+            self._submit()
+        else:
+            self._settle()
+
+    def _finish(self):
+        self._finished = True
+        self._version += 1
+        self._settle()
+
+    def _settle(self):
+        """Tell the schedule once it's finished and no run is left."""
+        with self._lock:
+            if not self._finished or self._running or self._pending or self._settled:
+                return
+            self._settled = True
+        if self._sched is not None:
+            self._sched._finished(self)
+
+    def _reschedule(self, calltime):
+        self._calltime = calltime
+        self._version += 1
+        if self._sched is not None:
+            self._sched._push(self)
 
     @property
     def isFinished(self):
         return self._finished
 
+    @property
+    def callTime(self):
+        """Time of the next callback, by the clock of its schedule."""
+        return self._calltime
+
     def __setTime(self, delta):
         if self._settingTime == self.after:
             self._waittime = delta
-            self._calltime = now() + self._waittime
+            self._start = self._clock() + self._waittime.total_seconds()
+            self._slot = 0
+            self._reschedule(self._start)
         elif self._settingTime == self.withInterval:
             self._interval = delta
         else:
@@ -88,38 +320,246 @@ class Job:
     def milliseconds(self):
         return self.__setTime(timedelta(milliseconds=self._timeval))
 
+    @property
+    def frames(self):
+        """Count of frames, only for a schedule with a FrameClock."""
+        if not isinstance(self._clock, FrameClock):
+            raise RuntimeError("Frames as a unit of time needs a schedule with a FrameClock.")
+        return self.__setTime(timedelta(seconds=self._timeval / self._clock.fps))
+
 
 class schedule:
+    """
+    Jobs wait in a heap ordered by their next call time, so an event costs O(log n)
+    for any count of jobs. run() sleeps until the next job is due, instead of
+    calling update() in a busy loop. Times come from `clock`, time.monotonic by
+    default, so changes of the system time don't affect jobs.
+    Jobs of I_Will_Do are called inline. Jobs of Call_Me_to_Do are run in a pool, or
+    on an asyncio loop for coroutine functions, so a slow job doesn't delay others.
+    """
 
-    def __init__(self):
-        self._jobs = []
-        self._async_jobs = []
+    def __init__(self, clock=time.monotonic, executor="thread", workers=None, loop=None):
+        """
+        Args:
+            @executor: pool for Call_Me_to_Do, "thread", "process", or a concurrent.futures.Executor.
+                        A process pool needs picklable callbacks and arguments.
+            @workers: max workers of the pool created for "thread" or "process".
+            @loop: asyncio loop to run coroutine functions of Call_Me_to_Do, it should be
+                        running in another thread. None means the loop of arun(), or a
+                        loop started in a background thread.
+        """
+        self.clock = clock
+        self._heap = []     # (call time, sequence, version, job)
+        self._seq = itertools.count()
+        self._remain = 0
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._executor = executor
+        self._workers = workers
+        self._ownExecutor = None
+        self.loop = loop
+        self._loopThread = None
+        self._wakeup = None     # asyncio.Event of arun()
 
     def I_Will_Do(self, callback, *args):
-        job = Job(callback, *args)
-        self._jobs.append(job)
+        job = Job(callback, *args, clock=self.clock)
+        job._sched = self
+        with self._cond:
+            self._remain += 1
+        self._push(job)
         return job
 
     def Call_Me_to_Do(self, callback, *args):
-        # todo
-        raise NotImplementedError
-        job = Job(callback, *args)
-        self._async_jobs.append(job)
+        """Like I_Will_Do, but the callback is run in the pool, or awaited on the asyncio
+        loop if it's a coroutine function. Set Job.overlap() for calls coming while the
+        previous run hasn't finished, and read the metrics in Job.stats."""
+        job = self.I_Will_Do(callback, *args)
+        job.stats = JobStats()
         return job
 
-    def update(self):
-        for job in self._jobs:
-            job.update()
-            if job.isFinished:
-                self._jobs.remove(job)
+    def _submit(self, callback, args):
+        """Start a run, return a concurrent.futures.Future of (start, end)."""
+        if asyncio.iscoroutinefunction(callback):
+            return asyncio.run_coroutine_threadsafe(_timed_async(callback, args), self._getLoop())
+        return self._getExecutor().submit(_timed, callback, args)
+
+    def _getExecutor(self):
+        if isinstance(self._executor, Executor):
+            return self._executor
+        if self._ownExecutor is None:
+            if self._executor == "process":
+                self._ownExecutor = ProcessPoolExecutor(self._workers)
+            elif self._executor == "thread":
+                self._ownExecutor = ThreadPoolExecutor(self._workers, "schedule")
+            else:
+                raise ValueError("Unknown executor " + str(self._executor))
+        return self._ownExecutor
+
+    def _getLoop(self):
+        with self._cond:
+            if self.loop is None:
+                self.loop = asyncio.new_event_loop()
+                self._loopThread = threading.Thread(
+                    target=self.loop.run_forever, name="schedule-loop", daemon=True)
+                self._loopThread.start()
+            return self.loop
+
+    def shutdown(self, wait=True):
+        """Shut down the pool and the loop created by the schedule."""
+        if self._ownExecutor is not None:
+            self._ownExecutor.shutdown(wait)
+            self._ownExecutor = None
+        if self._loopThread is not None:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            if wait:
+                self._loopThread.join()
+            self.loop = self._loopThread = None
+
+    def _push(self, job):
+        with self._cond:
+            heapq.heappush(self._heap, (job._calltime, next(self._seq), job._version, job))
+            self._notify()
+
+    def _finished(self, job):
+        with self._cond:
+            self._remain -= 1
+            self._notify()
+
+    def _notify(self):
+        """Wake up run() or arun() to check the next call time again."""
+        self._cond.notify()
+        if self._wakeup is not None:
+            self.loop.call_soon_threadsafe(self._wakeup.set)
+
+    def _peek(self):
+        """Return the next call time, dropping outdated entries on the way."""
+        while self._heap:
+            calltime, _, version, job = self._heap[0]
+            if version == job._version:
+                return calltime
+            heapq.heappop(self._heap)
+        return None
+
+    def update(self, t=None):
+        """Callback all jobs due at time `t`, now by default, and return how many were called.
+        A job is called at most once per update."""
+        t = self.clock() if t is None else t
+        due = []
+        with self._cond:
+            while self._heap and self._heap[0][0] <= t:
+                _, _, version, job = heapq.heappop(self._heap)
+                if version == job._version:
+                    due.append(job)
+        for job in due:
+            job._fire(t)
+        return len(due)
+
+    def _waitTime(self, end):
+        """Return seconds to sleep until the next job or `end`, None means until notified,
+        or -1 if run() should return."""
+        if self._stopped or self._remain == 0:
+            return -1
+        t = self.clock()
+        if end is not None and t >= end:
+            return -1
+        wait = self._peek()
+        if wait is not None:
+            wait = max(wait - t, 0)
+        if end is not None:
+            wait = end - t if wait is None else min(wait, end - t)
+        return wait
+
+    def tick(self, timestamp=None):
+        """With a FrameClock, move it to the next frame and callback the jobs due.
+        A job is called on the first frame less than half a frame before its time,
+        so jitter of timestamps doesn't delay it by a frame."""
+        self.clock.tick(timestamp)
+        return self.update(self.clock.time + 0.5 / self.clock.fps)
+
+    def follow(self, frames):
+        """Yield frames from an iterable, calling tick() before every frame. Items can be
+        (timestamp, frame) pairs, like from FrameRing, which are timed by their timestamps.
+        For plain frames of a camera or a video read on the caller's thread, like an
+        ImagesGetter without prefetch or workers, CAP_PROP_POS_MSEC of its capture is the
+        timestamp, so dropped or skipped frames don't make jobs drift. Frames are timed
+        by index / fps of the FrameClock if neither is available."""
+        cap = getattr(frames, "cap", None)
+        if getattr(frames, "prefetch", 0) > 0 or getattr(frames, "workers", 0) > 0:
+            cap = None  # the capture is ahead of the frames output
+        first = True
+        for item in frames:
+            if isinstance(item, tuple) and len(item) == 2:
+                timestamp, frame = item
+            else:
+                timestamp, frame = None, item
+                msec = cap.get(cv2.CAP_PROP_POS_MSEC) if cap is not None else 0
+                if msec > 0:
+                    timestamp = msec / 1000.
+                elif first and cap is not None:
+                    timestamp = 0.  # a video starts at 0, and falls back to index / fps later
+            first = False
+            self.tick(timestamp)
+            yield frame
+
+    def run(self, duration=None):
+        """Callback jobs on time until all finished, stop() is called, or `duration`
+        seconds passed. Sleeps until the next job is due. Runs of Call_Me_to_Do
+        count as not finished until they return."""
+        end = None if duration is None else self.clock() + duration
+        self._stopped = False
+        while True:
+            self.update()
+            with self._cond:
+                wait = self._waitTime(end)
+                if wait == -1:
+                    break
+                if wait is None or wait > 0:
+                    self._cond.wait(wait)
+
+    async def arun(self, duration=None):
+        """Same as run() on the running asyncio loop, coroutine functions of Call_Me_to_Do
+        are run as tasks of this loop."""
+        borrowed = self.loop is None
+        if borrowed:
+            self.loop = asyncio.get_running_loop()
+        end = None if duration is None else self.clock() + duration
+        self._stopped = False
+        self._wakeup = asyncio.Event()
+        try:
+            while True:
+                self.update()
+                with self._cond:
+                    wait = self._waitTime(end)
+                    self._wakeup.clear()
+                if wait == -1:
+                    break
+                if wait is None or wait > 0:
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), wait)
+                    except asyncio.TimeoutError:
+                        pass
+        finally:
+            self._wakeup = None
+            if borrowed:
+                self.loop = None
+
+    def run_until_complete(self):
+        """Callback jobs on time until all finished or stop() is called."""
+        self.run()
+
+    def stop(self):
+        """Make run() return, can be called from a job or another thread."""
+        with self._cond:
+            self._stopped = True
+            self._notify()
 
     @property
     def isFinishedAll(self):
-        return len(self._jobs) == 0
+        return self._remain == 0
 
     @property
     def remainJobNum(self):
-        return len(self._jobs)
+        return self._remain
 
 
 if __name__ == "__main__":
@@ -132,5 +572,6 @@ if __name__ == "__main__":
     sched = schedule()
     sched.I_Will_Do(printjob).after(3).seconds.repeat(5).withInterval(1).seconds.withParam(count,"Now is")
     sched.I_Will_Do(printjob,2,'time').withInterval(1).seconds.repeat(8)
-    while not sched.isFinishedAll:
-        sched.update()
+    sched.Call_Me_to_Do(printjob,"In a thread at").after(2).seconds.repeat(3).withInterval(1).seconds.overlap("skip")
+    sched.run_until_complete()
+    sched.shutdown()
@@ -0,0 +1,38 @@
+'''
+Description : Checks of caching decoded frames of videos.
+FilePath    : /qxtoolkit/tests/test_framecache.py
+Author      : qxsoftware@163.com
+Date        : 2026-10-18 10:02:13
+LastEditTime: 2026-10-18 10:02:13
+Refer to    : https://github.com/QixuanAI/qxtoolkit
+'''
+
+import numpy as np
+from qxtoolkit import FrameCache
+
+
+def test_writer_drops_frames_of_mixed_shapes(tmp_path):
+    src = tmp_path / "video.avi"
+    src.write_bytes(b"not decoded here")
+    cache = FrameCache(tmp_path / "cache")
+    writer = cache.writer(str(src), 25)
+    for shape in [(4, 6, 3), (4, 6, 3), (6, 4, 3), (4, 6, 3)]:
+        writer.write(np.zeros(shape, np.uint8))
+    assert not writer.isOpened
+    writer.commit()
+    assert cache.load(str(src)) is None
+    assert not list((tmp_path / "cache").iterdir())
+
+
+def test_writer_commits_frames(tmp_path):
+    src = tmp_path / "video.avi"
+    src.write_bytes(b"not decoded here")
+    cache = FrameCache(tmp_path / "cache")
+    writer = cache.writer(str(src), 25)
+    frames = np.arange(3 * 4 * 6 * 3, dtype=np.uint8).reshape(3, 4, 6, 3)
+    for frame in frames:
+        writer.write(frame)
+    writer.commit()
+    cached, fps = cache.load(str(src))
+    assert fps == 25
+    np.testing.assert_array_equal(cached, frames)
@@ -0,0 +1,42 @@
+'''
+Description : Checks of Graffiti layers against plain OpenCV drawing.
+FilePath    : /qxtoolkit/tests/test_graffiti.py
+Author      : qxsoftware@163.com
+Date        : 2026-10-18 10:02:13
+LastEditTime: 2026-10-18 10:02:13
+Refer to    : https://github.com/QixuanAI/qxtoolkit
+'''
+
+import cv2
+import numpy as np
+import pytest
+from qxtoolkit import Graffiti, MotionGraffiti
+
+
+@pytest.mark.parametrize("thickness", [1, 2, 3, 4, 7, -1])
+@pytest.mark.parametrize("corners", [((40, 30), (59, 44)), ((90, 10), (20, 100)), ((5, 5), (6, 5))])
+def test_box_matches_cv2_rectangle(thickness, corners):
+    expected = np.zeros((120, 160, 3), np.uint8)
+    cv2.rectangle(expected, *corners, (255, 0, 0), thickness)
+    graffiti = Graffiti()
+    graffiti.box(*corners, (255, 0, 0), thickness)
+    img = graffiti(np.zeros_like(expected))
+    np.testing.assert_array_equal(img, expected)
+
+
+def test_motion_graffiti_drops_removed_layers_at_once():
+    graffiti = MotionGraffiti()
+    first = graffiti.box((10, 10), (50, 40), (0, 255, 0), 2)
+    graffiti.box((80, 60), (140, 100), (0, 0, 255), -1)
+    frame = np.zeros((120, 160, 3), np.uint8)
+    for t in range(3):
+        assert graffiti(frame.copy(), t / 30.).any()
+    graffiti.remove(first)
+    expected = frame.copy()
+    cv2.rectangle(expected, (80, 60), (140, 100), (0, 0, 255), -1)
+    np.testing.assert_array_equal(graffiti(frame.copy(), 3 / 30.), expected)
+    graffiti.clear()
+    assert not graffiti(frame.copy(), 4 / 30.).any()
+    graffiti.caption("new", (20, 20))
+    assert graffiti(frame.copy(), 5 / 30.).any()
+    graffiti.close()
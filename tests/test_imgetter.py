@@ -0,0 +1,60 @@
+'''
+Description : Checks of random access and motion filtering of ImagesGetter.
+FilePath    : /qxtoolkit/tests/test_imgetter.py
+Author      : qxsoftware@163.com
+Date        : 2026-10-18 10:02:13
+LastEditTime: 2026-10-18 10:02:13
+Refer to    : https://github.com/QixuanAI/qxtoolkit
+'''
+
+import cv2
+import numpy as np
+import pytest
+from qxtoolkit import ImagesGetter, MotionDetector, SpiralCurve, render_video
+
+
+@pytest.fixture(scope="module")
+def video(tmp_path_factory):
+    path = tmp_path_factory.mktemp("video") / "spiral.avi"
+    render_video(SpiralCurve(size=(160, 120)), str(path), fourcc="MJPG", stop=12)
+    return str(path)
+
+
+def test_slice_with_reuse_returns_distinct_frames(video):
+    frames = ImagesGetter(video, scale=0.5, reuse=2)[0:6]
+    assert len({id(f) for f in frames}) == 6
+    assert not any(np.may_share_memory(a, b) for i, a in enumerate(frames) for b in frames[i+1:])
+    getter = ImagesGetter(video, scale=0.5)
+    for i, frame in enumerate(frames):
+        assert frame.shape == (60, 80, 3)
+        np.testing.assert_array_equal(frame, getter[i])
+
+
+def test_moving_skips_missing_frames(tmp_path):
+    for i in range(7):
+        cv2.imwrite(str(tmp_path / "{:02d}.jpg".format(i)), np.full((40, 40, 3), i * 30, np.uint8))
+    frames = list(ImagesGetter(str(tmp_path), interval=2).moving(MotionDetector(alpha=1)))
+    assert all(f is not None for f in frames)
+    assert MotionDetector()(None) is False
+
+
+@pytest.mark.parametrize("ring", [1, 2, 3])
+def test_batches_ring_keeps_batches_valid(video, ring):
+    expected = list(ImagesGetter(video).batches(2))
+    kept = []
+    for k, batch in enumerate(ImagesGetter(video).batches(2, ring=ring)):
+        kept.append((k, batch, batch.copy()))
+        for j, old, copy in kept:
+            if k - j < ring:  # yielded at most ring - 1 batches ago
+                np.testing.assert_array_equal(old, copy)
+                np.testing.assert_array_equal(old, expected[j])
+    assert len(kept) == len(expected)
+
+
+def test_reuse_keeps_welcome_out_of_the_ring():
+    getter = ImagesGetter("synthetic:lissajous?width=64&height=48&realtime=0", reuse=2, cam_warmup=1)
+    welcome = getter.welcome.copy()
+    frames = [next(getter) for _ in range(6)]
+    assert not any(np.may_share_memory(getter.welcome, f) for f in frames)
+    assert not any(np.may_share_memory(a, b) for a, b in zip(frames, frames[1:]))
+    np.testing.assert_array_equal(getter.welcome, welcome)